@@ -0,0 +1,25 @@
+from luminapie import extract, path_dictionary
+import argparse
+import sys
+
+
+def main():
+    # type: () -> int
+    parser = argparse.ArgumentParser(prog="python -m luminapie")
+    commands = parser.add_subparsers(dest="command", required=True)
+    extract.add_arguments(
+        commands.add_parser("extract", help="extract game files to disk")
+    )
+    path_dictionary.add_arguments(
+        commands.add_parser("paths", help="build or query a hash to path dictionary")
+    )
+    args = parser.parse_args()
+    if args.command == "extract":
+        return extract.run(args)
+    if args.command == "paths":
+        return path_dictionary.run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+from luminapie.game_data import GameData, ParsedFileName
+from concurrent.futures import Executor
+from functools import partial
+from typing import AsyncIterator, Callable, Iterable, Iterator, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+
+def parse_file_name(file):
+    # type: (ParsedFileName | str) -> ParsedFileName
+    return file if isinstance(file, ParsedFileName) else ParsedFileName(file)
+
+
+class AsyncGameData:
+    """
+    asyncio front-end over a GameData.
+
+    Every read and inflate runs on an executor, at most max_concurrency at a
+    time, so the event loop is never blocked on disk or zlib. The wrapped
+    GameData is shared as is, its indexes and dat readers serve both APIs.
+    """
+
+    def __init__(self, game_data, max_concurrency=8, executor=None):
+        # type: (GameData, int, Executor | None) -> None
+        self.game_data = game_data
+        # None runs on the event loop's default executor
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        # created on first use in the running loop, a Semaphore created here
+        # would be bound to whatever loop is current (Python 3.9) or to the
+        # first loop it waits in, and fail under a later asyncio.run()
+        self.semaphore = None  # type: asyncio.Semaphore | None
+        self.loop = None  # type: asyncio.AbstractEventLoop | None
+
+    @classmethod
+    async def open(cls, root, max_concurrency=8, executor=None, **kwargs):
+        # type: (str, int, Executor | None, object) -> AsyncGameData
+        """Create the GameData on the executor, kwargs are passed to GameData."""
+        loop = asyncio.get_running_loop()
+        game_data = await loop.run_in_executor(
+            executor, partial(GameData, root, **kwargs)
+        )
+        return cls(game_data, max_concurrency, executor)
+
+    def get_semaphore(self):
+        # type: () -> asyncio.Semaphore
+        """The semaphore of the running loop, a new one if the loop changed."""
+        loop = asyncio.get_running_loop()
+        if self.semaphore is None or self.loop is not loop:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.loop = loop
+        return self.semaphore
+
+    async def run(self, func, *args):
+        # type: (Callable[..., T], object) -> T
+        async with self.get_semaphore():
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, partial(func, *args)
+            )
+
+    async def iterate(self, iterator):
+        # type: (Iterator[T]) -> AsyncIterator[T]
+        """Step a blocking iterator on the executor, one item per executor call."""
+        done = object()
+        try:
+            while True:
+                item = await self.run(next, iterator, done)
+                if item is done:
+                    break
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                await self.run(close)
+
+    async def get_file(self, file):
+        # type: (ParsedFileName | str) -> list[bytes]
+        return await self.run(self.game_data.get_file, parse_file_name(file))
+
+    async def read_file_into(self, file):
+        # type: (ParsedFileName | str) -> bytearray
+        return await self.run(self.game_data.read_file_into, parse_file_name(file))
+
+    async def read_range(self, file, offset, length):
+        # type: (ParsedFileName | str, int, int) -> bytes
+        return await self.run(
+            self.game_data.read_range, parse_file_name(file), offset, length
+        )
+
+    async def iter_file(self, file):
+        # type: (ParsedFileName | str) -> AsyncIterator[bytes]
+        """The file's blocks, each read and inflated on the executor."""
+        blocks = await self.run(self.game_data.iter_file, parse_file_name(file))
+        async for block in self.iterate(blocks):
+            yield block
+
+    async def get_files(self, files, missing_ok=False):
+        # type: (Iterable[ParsedFileName | str], bool) -> AsyncIterator[tuple[ParsedFileName | str, list[bytes]]]
+        """GameData.get_files, yielding each file as soon as it has been read."""
+        results = self.game_data.get_files(files, missing_ok)
+        async for result in self.iterate(results):
+            yield result
+
+    async def close(self):
+        # type: () -> None
+        await self.run(self.game_data.close)
+
+    async def __aenter__(self):
+        # type: () -> AsyncGameData
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        # type: (type, BaseException, object) -> None
+        await self.close()
+
+    def __repr__(self):
+        # type: () -> str
+        return "AsyncGameData: {0}".format(self.game_data)
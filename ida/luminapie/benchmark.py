@@ -0,0 +1,234 @@
+"""
+Micro benchmarks and checks for luminapie.
+
+    python -m luminapie.benchmark decompress [--game PATH --file exd/item_0_en.exd]
+    python -m luminapie.benchmark stress --game PATH [--threads 16]
+    python -m luminapie.benchmark crc [--count 1000000]
+"""
+from luminapie.sqpack import (
+    PARALLEL_BATCH,
+    DatBlockHeader,
+    decompress_block,
+    decompress_blocks,
+)
+from luminapie.game_data import GameData, ParsedFileName
+from luminapie.se_crc import Crc32, PyCrc32
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import random
+import struct
+import time
+import zlib
+
+
+def timed(func, repeat):
+    # type: (callable, int) -> float
+    """Best wall time of repeat calls to func, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name, seconds, size, baseline=None):
+    # type: (str, float, int, float | None) -> None
+    line = "{0:<24} {1:8.2f} ms {2:9.1f} MB/s".format(
+        name, seconds * 1000, size / seconds / (1 << 20)
+    )
+    if baseline is not None:
+        line += "  x{0:.2f}".format(baseline / seconds)
+    print(line)
+
+
+def synthetic_blocks(size, block_size=16000):
+    # type: (int, int) -> list[tuple[DatBlockHeader, bytes]]
+    """Raw deflate blocks shaped like the ones in a standard dat file."""
+    blocks = []
+    for offset in range(0, size, block_size):
+        # half random, half repetitive, roughly the ratio of real game files
+        pattern = "{0:08x} ".format(offset).encode("ascii") * (block_size // 18)
+        raw = os.urandom(block_size // 2) + pattern[: block_size // 2]
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        payload = compressor.compress(raw) + compressor.flush()
+        header = DatBlockHeader(struct.pack("<IIII", 16, 0, len(payload), len(raw)))
+        blocks.append((header, payload))
+    return blocks
+
+
+def bench_decompress(args):
+    # type: (argparse.Namespace) -> None
+    if args.game is not None:
+        path = ParsedFileName(args.file)
+        with GameData(args.game, load_schema=False) as game_data:
+            size = sum(len(block) for block in game_data.get_file(path))
+            serial = timed(lambda: game_data.get_file(path), args.repeat)
+        with GameData(
+            args.game,
+            load_schema=False,
+            decompress_workers=args.workers,
+            parallel_threshold=0,
+        ) as game_data:
+            game_data.get_file(path)
+            parallel = timed(lambda: game_data.get_file(path), args.repeat)
+        print("{0}: {1} bytes".format(args.file, size))
+    else:
+        blocks = synthetic_blocks(args.size << 20)
+        batches = [
+            blocks[i : i + PARALLEL_BATCH]
+            for i in range(0, len(blocks), PARALLEL_BATCH)
+        ]
+        size = sum(len(decompress_block(h, p)) for h, p in blocks)
+        serial = timed(
+            lambda: [decompress_block(h, p) for h, p in blocks], args.repeat
+        )
+        with ThreadPoolExecutor(args.workers) as executor:
+            parallel = timed(
+                lambda: list(executor.map(decompress_blocks, batches)),
+                args.repeat,
+            )
+        print("synthetic: {0} blocks, {1} bytes".format(len(blocks), size))
+    report("serial", serial, size)
+    report("{0} threads".format(args.workers), parallel, size, serial)
+
+
+def synthetic_paths(count, folders=2000):
+    # type: (int, int) -> list[str]
+    """Game-like paths, many files per folder like real path lists."""
+    random.seed(count)
+    folder_names = [
+        "{0}/{1:04x}/{2}".format(
+            random.choice(["bg/ffxiv", "chara/monster", "ui/uld", "exd", "vfx/common"]),
+            i,
+            random.choice(["texture", "model", "level", "eff"]),
+        )
+        for i in range(folders)
+    ]
+    return [
+        "{0}/file_{1:x}.{2}".format(
+            random.choice(folder_names), i, random.choice(["tex", "mdl", "uld", "exd"])
+        )
+        for i in range(count)
+    ]
+
+
+def bench_crc(args):
+    # type: (argparse.Namespace) -> None
+    paths = synthetic_paths(args.count)
+    reference = paths[: args.reference_count]
+    fast = Crc32()
+    slow = PyCrc32()
+    slow_index = [slow.calc_index(path) for path in reference]
+    slow_index2 = [slow.calc_index2(path) for path in reference]
+    if fast.calc_index_many(reference) != slow_index:
+        raise SystemExit("index hashes differ from the reference implementation")
+    if fast.calc_index2_many(reference) != slow_index2:
+        raise SystemExit("index2 hashes differ from the reference implementation")
+    if fast.calc_indexes_many(reference) != list(zip(slow_index, slow_index2)):
+        raise SystemExit("memoized hashes differ from the reference implementation")
+
+    for name, func in (
+        ("calc_index", lambda: fast.calc_index_many(paths)),
+        ("calc_index2", lambda: fast.calc_index2_many(paths)),
+        ("calc_indexes", lambda: fast.calc_indexes_many(paths)),
+        ("ParsedFileName.from_many", lambda: ParsedFileName.from_many(paths)),
+        ("reference calc_index", lambda: [slow.calc_index(p) for p in reference]),
+        ("reference calc_index2", lambda: [slow.calc_index2(p) for p in reference]),
+    ):
+        count = len(reference) if name.startswith("reference") else len(paths)
+        seconds = timed(func, 1 if name.startswith("reference") else args.repeat)
+        print(
+            "{0:<24} {1:9.0f} paths/s {2:8.2f} s per million".format(
+                name, count / seconds, seconds / count * 1e6
+            )
+        )
+
+
+def bench_stress(args):
+    # type: (argparse.Namespace) -> None
+    """Read the same files from many threads through one GameData and compare."""
+    with GameData(
+        args.game, load_schema=False, use_mmap=args.mmap, max_open_files=args.max_open
+    ) as game_data:
+        repo = game_data.repositories[0]
+        expected: dict[tuple[int, int], bytes] = {}
+        for category in repo.discover_categories().values():
+            index = category.load()
+            step = max(1, len(index) // args.files)
+            for pos in range(0, len(index), step):
+                key = (index.hashes[pos], category.category)
+                try:
+                    expected[key] = b"".join(repo.get_file(*key))
+                except Exception:
+                    # empty, model and texture files can't be read yet
+                    continue
+        keys = list(expected) * args.rounds
+        random.shuffle(keys)
+
+        def check(key):
+            # type: (tuple[int, int]) -> bool
+            return b"".join(repo.get_file(*key)) == expected[key]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as executor:
+            mismatches = list(executor.map(check, keys)).count(False)
+        seconds = time.perf_counter() - start
+        print(
+            "{0} reads of {1} files on {2} threads in {3:.2f}s, {4} mismatches".format(
+                len(keys), len(expected), args.threads, seconds, mismatches
+            )
+        )
+        print(repo.pool)
+    if mismatches:
+        raise SystemExit(1)
+
+
+def main():
+    # type: () -> None
+    parser = argparse.ArgumentParser(prog="python -m luminapie.benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    decompress = commands.add_parser(
+        "decompress", help="serial vs threaded block inflate of one standard file"
+    )
+    decompress.add_argument("--game", help="game folder, synthetic blocks if omitted")
+    decompress.add_argument("--file", default="exd/item_0_en.exd")
+    decompress.add_argument("--size", type=int, default=8, help="synthetic MB")
+    decompress.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    decompress.add_argument("--repeat", type=int, default=5)
+    decompress.set_defaults(func=bench_decompress)
+
+    stress = commands.add_parser(
+        "stress", help="concurrent reads from one GameData must match serial reads"
+    )
+    stress.add_argument("--game", required=True, help="game folder")
+    stress.add_argument("--files", type=int, default=500, help="per category")
+    stress.add_argument("--rounds", type=int, default=8)
+    stress.add_argument("--threads", type=int, default=16)
+    stress.add_argument(
+        "--max-open", type=int, default=2, help="small to force pool evictions"
+    )
+    stress.add_argument("--mmap", action="store_true")
+    stress.set_defaults(func=bench_stress)
+
+    crc = commands.add_parser(
+        "crc", help="zlib backed SE CRC vs the pure-Python reference over many paths"
+    )
+    crc.add_argument("--count", type=int, default=1000000)
+    crc.add_argument(
+        "--reference-count",
+        type=int,
+        default=1000000,
+        help="paths hashed by the slow reference, lower it for a quick run",
+    )
+    crc.add_argument("--repeat", type=int, default=3)
+    crc.set_defaults(func=bench_crc)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+import threading
+from luminapie.definitions import SemanticVersion
+
+
+class FileCache:
+    """
+    Least-recently-used cache of decompressed files, bounded by their total size.
+
+    Entries are keyed by (repository index, path) and dropped on lookup when
+    the version they were stored with isn't the one passed in. That version is
+    the repository's last parsed one, which only GameData.refresh() re-reads,
+    so entries read before a patch are served until refresh() is called.
+    """
+
+    def __init__(self, max_bytes):
+        # type: (int) -> None
+        self.max_bytes = max_bytes
+        # (repository, path) -> (repository version, blocks, size)
+        self.entries: OrderedDict[
+            tuple[int, str], tuple[SemanticVersion, tuple[bytes, ...], int]
+        ] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        # type: (tuple[int, str], SemanticVersion) -> tuple[bytes, ...] | None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    self.remove(key)
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, data):
+        # type: (tuple[int, str], SemanticVersion, list[bytes]) -> None
+        with self.lock:
+            size = sum(len(block) for block in data)
+            if size > self.max_bytes:
+                return
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (version, tuple(data), size)
+            self.size += size
+            while self.size > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def remove(self, key):
+        # type: (tuple[int, str]) -> None
+        # the caller holds the lock
+        self.size -= self.entries.pop(key)[2]
+
+    def invalidate(self, repository=None):
+        # type: (int | None) -> None
+        """Drop every entry, or only those of one repository."""
+        with self.lock:
+            if repository is None:
+                self.entries.clear()
+                self.size = 0
+                return
+            for key in [key for key in self.entries if key[0] == repository]:
+                self.remove(key)
+
+    def stats(self):
+        # type: () -> dict[str, int]
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.size,
+            }
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.entries)
+
+    def __repr__(self):
+        # type: () -> str
+        return "FileCache: {0}/{1} bytes, {2}".format(
+            self.size, self.max_bytes, self.stats()
+        )
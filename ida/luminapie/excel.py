@@ -1,11 +1,31 @@
-from luminapie.enums import ExcelColumnDataType
+from luminapie.enums import ExcelColumnDataType, Language
 from luminapie.definitions import Definition
 
 
+LANGUAGE_SUFFIXES = {
+    Language.None_: "",
+    Language.Japanese: "_ja",
+    Language.English: "_en",
+    Language.German: "_de",
+    Language.French: "_fr",
+    Language.ChineseSimplified: "_chs",
+    Language.ChineseTraditional: "_cht",
+    Language.Korean: "_ko",
+}
+
+
+def get_exd_path(name, start_id, language):
+    # type: (str, int, int) -> str
+    """The path of one page of a sheet, e.g. exd/item_0_en.exd."""
+    return "exd/{0}_{1}{2}.exd".format(name, start_id, LANGUAGE_SUFFIXES[language])
+
+
 class ExcelListFile:
     def __init__(self, data):
-        # type: (list[bytes]) -> None
-        self.data = b"".join(data).split("\r\n".encode("utf-8"))
+        # type: (list[bytes] | bytes) -> None
+        if isinstance(data, list):
+            data = b"".join(data)
+        self.data = data.split("\r\n".encode("utf-8"))
         self.parse()
 
     def parse(self):
@@ -42,9 +62,9 @@ class ExcelHeader:
         self.page_count = int.from_bytes(self.data[10:12], "big")
         self.language_count = int.from_bytes(self.data[12:14], "big")
         self.unknown1 = int.from_bytes(self.data[14:16], "big")
-        self.unknown2 = self.data[17]
-        self.variant = self.data[18]
-        self.unknown3 = int.from_bytes(self.data[19:20], "big")
+        self.unknown2 = self.data[16]
+        self.variant = self.data[17]
+        self.unknown3 = int.from_bytes(self.data[18:20], "big")
         self.row_count = int.from_bytes(self.data[20:24], "big")
         self.unknown4 = [
             int.from_bytes(self.data[24:28], "big"),
@@ -100,8 +120,8 @@ class ExcelDataPagination:
 
     def parse(self):
         # type: () -> None
-        self.start_id = int.from_bytes(self.data[0:2], "big")
-        self.row_count = int.from_bytes(self.data[2:4], "big")
+        self.start_id = int.from_bytes(self.data[0:4], "big")
+        self.row_count = int.from_bytes(self.data[4:8], "big")
 
     def __repr__(self):
         # type: () -> str
@@ -110,9 +130,10 @@ class ExcelDataPagination:
 
 class ExcelHeaderFile:
     def __init__(self, data, name):
-        # type: (list[bytes], str) -> None
-        self.data = data[0]
+        # type: (list[bytes] | bytes, str) -> None
+        self.data = b"".join(data) if isinstance(data, list) else data
         self.column_definitions: list[ExcelColumnDefinition] = []
+        self.columns: list[ExcelColumnDefinition] = []
         self.pagination: list[ExcelDataPagination] = []
         self.languages: list[int] = []
         self.header: ExcelHeader = None
@@ -123,35 +144,31 @@ class ExcelHeaderFile:
         # type: () -> None
         self.header = ExcelHeader(self.data[0:32])
         if self.header.magic != b"EXHF":
-            raise Exception("Invalid EXHF header")
+            raise ValueError("Invalid EXHF header")
         self.column_definitions: list[ExcelColumnDefinition] = []
         for i in range(self.header.column_count):
             self.column_definitions.append(
                 ExcelColumnDefinition(self.data[32 + (i * 4) : 32 + ((i + 1) * 4)])
             )
+        # in file order, the column order of the sheet's schema
+        self.columns = list(self.column_definitions)
         self.column_definitions = sorted(self.column_definitions)
+        # pages are a big endian uint32 start row id and row count
+        pages_offset = 32 + (self.header.column_count * 4)
         self.pagination: list[ExcelDataPagination] = []
         for i in range(self.header.page_count):
             self.pagination.append(
                 ExcelDataPagination(
-                    self.data[
-                        32
-                        + (self.header.column_count * 4)
-                        + (i * 4) : 32
-                        + (self.header.column_count * 4)
-                        + ((i + 1) * 4)
-                    ]
+                    self.data[pages_offset + (i * 8) : pages_offset + ((i + 1) * 8)]
                 )
             )
+        # languages are little endian uint16s
+        languages_offset = pages_offset + (self.header.page_count * 8)
         self.languages: list[int] = []
         for i in range(self.header.language_count):
+            offset = languages_offset + (i * 2)
             self.languages.append(
-                self.data[
-                    32
-                    + (self.header.column_count * 4)
-                    + (self.header.page_count * 4)
-                    + i
-                ]
+                int.from_bytes(self.data[offset : offset + 2], "little")
             )
 
     def map_names(self, names: list[Definition]) -> tuple[dict[int, tuple[str, str]], dict[str, dict[int, str]], int]:
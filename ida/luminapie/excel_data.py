@@ -0,0 +1,674 @@
+"""
+Reading the rows of excel sheets from their EXD data pages.
+
+A page is a 0x20 byte header, a table of (row id, offset) pairs and the rows.
+Each row is a big endian uint32 size and uint16 subrow count, the fixed size
+data described by the columns of the sheet's header, then the row's strings,
+which string columns point into. In sheets with subrows (variant 2) every
+subrow is a uint16 subrow id and its fixed size data, and the strings of all
+of them follow the last one.
+
+Rows aren't at a fixed stride because of the strings, so a page is decoded by
+picking every (sub)row out of a view of the whole page, one NumPy structured
+element each, instead of unpacking row by row.
+"""
+from luminapie.enums import ExcelColumnDataType, Language
+from luminapie.excel import ExcelHeaderFile, get_exd_path
+from luminapie.game_data import GameData, ParsedFileName
+from luminapie.sestring import SeString, get_text
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from numpy.lib import recfunctions
+from typing import Iterable, Iterator
+import numpy as np
+import threading
+
+EXD_HEADER_SIZE = 0x20
+ROW_HEADER_SIZE = 6
+SUBROW_HEADER_SIZE = 2
+VARIANT_DEFAULT = 1
+VARIANT_SUBROWS = 2
+
+COLUMN_FORMATS = {
+    # offset of the string in the row's strings
+    ExcelColumnDataType.String: ">u4",
+    ExcelColumnDataType.Bool: "?",
+    ExcelColumnDataType.Int8: "i1",
+    ExcelColumnDataType.UInt8: "u1",
+    ExcelColumnDataType.Int16: ">i2",
+    ExcelColumnDataType.UInt16: ">u2",
+    ExcelColumnDataType.Int32: ">i4",
+    ExcelColumnDataType.UInt32: ">u4",
+    ExcelColumnDataType.Float32: ">f4",
+    ExcelColumnDataType.Int64: ">i8",
+    ExcelColumnDataType.UInt64: ">u8",
+}
+
+
+def is_packed_bool(column_type):
+    # type: (ExcelColumnDataType) -> bool
+    return (
+        ExcelColumnDataType.PackedBool0
+        <= column_type
+        <= ExcelColumnDataType.PackedBool7
+    )
+
+
+def get_row_dtype(header):
+    # type: (ExcelHeaderFile) -> np.dtype
+    """
+    The fixed size data of a row, one field per column in schema order, named
+    column_0, column_1, ...
+
+    Packed bools are the whole byte they are packed in, ExcelDataFile.column
+    picks out their bit.
+    """
+    names: list[str] = []
+    formats: list[str] = []
+    offsets: list[int] = []
+    for i, column in enumerate(header.columns):
+        names.append("column_{0}".format(i))
+        offsets.append(column.offset)
+        if is_packed_bool(column.type):
+            formats.append("u1")
+        elif column.type in COLUMN_FORMATS:
+            formats.append(COLUMN_FORMATS[column.type])
+        else:
+            raise Exception(
+                "Unknown column type {0} in {1}".format(column.type, header.name)
+            )
+    return np.dtype(
+        {
+            "names": names,
+            "formats": formats,
+            "offsets": offsets,
+            "itemsize": header.header.data_offset,
+        }
+    )
+
+
+def pick(data, starts, dtype):
+    # type: (bytes | bytearray, np.ndarray, np.dtype) -> np.ndarray
+    """Copy the dtype sized values at each of the byte offsets starts of data."""
+    if dtype.itemsize == 0 or len(starts) == 0:
+        return np.zeros(len(starts), dtype)
+    buffer = np.frombuffer(data, np.uint8)
+    # every byte as the start of a value, overlapping
+    windows = np.ndarray(
+        (max(0, len(buffer) - dtype.itemsize + 1),), dtype, buffer, 0, (1,)
+    )
+    if starts.min() < 0 or starts.max() >= len(windows):
+        raise Exception("Row out of bounds")
+    return windows[starts]
+
+
+class StringTable:
+    """
+    The strings read by the sheets sharing this table, so a string repeated
+    across rows, pages and languages is kept, and decoded, once.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self.raw: dict[bytes, bytes] = {}
+        self.text: dict[bytes, str] = {}
+
+    def intern(self, raw):
+        # type: (bytes) -> bytes
+        return self.raw.setdefault(raw, raw)
+
+    def decode(self, raw):
+        # type: (bytes) -> str
+        text = self.text.get(raw)
+        if text is None:
+            text = self.text.setdefault(raw, get_text(raw))
+        return text
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.raw)
+
+    def __repr__(self):
+        # type: () -> str
+        return "StringTable: {0} strings, {1} decoded".format(
+            len(self.raw), len(self.text)
+        )
+
+
+class ExcelString:
+    """
+    A value of a string column, its interned bytes decoded on access.
+
+    Handles only hold the bytes of their own string, not the page, so they
+    don't keep evicted pages alive. They compare and hash by their bytes,
+    compare str with .text.
+    """
+
+    def __init__(self, raw, string_table):
+        # type: (bytes, StringTable) -> None
+        self.raw = raw
+        self.string_table = string_table
+
+    @property
+    def text(self):
+        # type: () -> str
+        """The text without macros."""
+        return self.string_table.decode(self.raw)
+
+    @property
+    def sestring(self):
+        # type: () -> SeString
+        """The text and parsed macros."""
+        return SeString(self.raw)
+
+    def __str__(self):
+        # type: () -> str
+        return self.text
+
+    def __eq__(self, other):
+        # type: (object) -> bool
+        if isinstance(other, ExcelString):
+            return self.raw == other.raw
+        if isinstance(other, (bytes, bytearray)):
+            return self.raw == other
+        return NotImplemented
+
+    def __hash__(self):
+        # type: () -> int
+        return hash(self.raw)
+
+    def __repr__(self):
+        # type: () -> str
+        return repr(self.text)
+
+
+def read_sheet_header(game_data, name):
+    # type: (GameData, str) -> ExcelHeaderFile
+    return ExcelHeaderFile(
+        game_data.read_file_into(ParsedFileName("exd/{0}.exh".format(name))), name
+    )
+
+
+def get_sheet_language(header, language):
+    # type: (ExcelHeaderFile, int) -> Language
+    """The language of the pages to read, untranslated sheets only have None_."""
+    if Language.None_ in header.languages:
+        return Language.None_
+    if language not in header.languages:
+        raise Exception(
+            "{0} isn't available in {1}, only {2}".format(
+                Language(language).name,
+                header.name,
+                [Language(x).name for x in header.languages],
+            )
+        )
+    return Language(language)
+
+
+class ExcelDataFile:
+    """
+    One page, its columns have a value for every (sub)row: ids and subrow_ids
+    say which one, row_ids, row_offsets and first_subrows are per row.
+
+    fields has the values of every column by field name, views of rows or,
+    after share_columns, arrays of the same page in another language.
+    """
+
+    def __init__(self, data, header, string_table=None):
+        # type: (list[bytes] | bytes | bytearray, ExcelHeaderFile, StringTable | None) -> None
+        self.data = b"".join(data) if isinstance(data, list) else data
+        self.header = header
+        self.string_table = string_table if string_table is not None else StringTable()
+        self.parse()
+
+    def parse(self):
+        # type: () -> None
+        if self.data[0:4] != b"EXDF":
+            raise Exception("Invalid EXDF header")
+        variant = self.header.header.variant
+        if variant not in (VARIANT_DEFAULT, VARIANT_SUBROWS):
+            raise Exception(
+                "Unknown variant {0} of {1}".format(variant, self.header.name)
+            )
+        self.version = int.from_bytes(self.data[4:6], "big")
+        index_size = int.from_bytes(self.data[8:12], "big")
+        self.data_size = int.from_bytes(self.data[12:16], "big")
+        table = np.frombuffer(
+            self.data, ">u4", index_size // 4, EXD_HEADER_SIZE
+        ).reshape(-1, 2)
+        if np.any(table[1:, 0] < table[:-1, 0]):
+            table = table[np.argsort(table[:, 0], kind="stable")]
+        # row id -> byte offset of the row, sorted for searchsorted
+        self.row_ids = table[:, 0].astype(np.uint32)
+        self.row_offsets = table[:, 1].astype(np.int64)
+
+        dtype = get_row_dtype(self.header)
+        row_starts = self.row_offsets + ROW_HEADER_SIZE
+        if variant == VARIANT_SUBROWS:
+            counts = pick(self.data, self.row_offsets + 4, np.dtype(">u2"))
+            counts = counts.astype(np.int64)
+            subrow_size = SUBROW_HEADER_SIZE + dtype.itemsize
+        else:
+            counts = np.ones(len(self.row_ids), np.int64)
+            subrow_size = dtype.itemsize
+        self.first_subrows = np.zeros(len(self.row_ids) + 1, np.int64)
+        np.cumsum(counts, out=self.first_subrows[1:])
+        subrows = np.arange(self.first_subrows[-1]) - np.repeat(
+            self.first_subrows[:-1], counts
+        )
+        row_starts = np.repeat(row_starts, counts)
+        starts = row_starts + subrows * subrow_size
+        if variant == VARIANT_SUBROWS:
+            self.subrow_ids = pick(self.data, starts, np.dtype(">u2"))
+            self.subrow_ids = self.subrow_ids.astype(np.uint16)
+            starts += SUBROW_HEADER_SIZE
+        else:
+            self.subrow_ids = np.zeros(len(starts), np.uint16)
+        self.ids = np.repeat(self.row_ids, counts)
+        # the strings of a row follow the fixed size data of its last subrow
+        self.string_offsets = row_starts + np.repeat(counts, counts) * subrow_size
+        self.rows = pick(self.data, starts, dtype)
+        self.fields = {name: self.rows[name] for name in dtype.names or ()}
+        # fields whose values are those of another page, see share_columns
+        self.shared: set[str] = set()
+
+    def find(self, row_id):
+        # type: (int) -> int
+        """The position of row_id in row_ids, -1 if it isn't in this page."""
+        pos = int(np.searchsorted(self.row_ids, row_id))
+        if pos == len(self.row_ids) or self.row_ids[pos] != row_id:
+            return -1
+        return pos
+
+    def get_subrows(self, pos):
+        # type: (int) -> range
+        """The positions in rows of the subrows of the row at pos in row_ids."""
+        return range(int(self.first_subrows[pos]), int(self.first_subrows[pos + 1]))
+
+    def column(self, index):
+        # type: (int) -> np.ndarray
+        """The values of one column for every (sub)row, packed bools as bools."""
+        values = self.fields["column_{0}".format(index)]
+        column_type = self.header.columns[index].type
+        if is_packed_bool(column_type):
+            mask = 1 << (column_type - ExcelColumnDataType.PackedBool0)
+            return (values & mask) != 0
+        return values
+
+    def get_string_starts(self, index):
+        # type: (int) -> np.ndarray
+        """The byte offsets in the page of the strings of a string column."""
+        return self.string_offsets + self.fields["column_{0}".format(index)]
+
+    def read_string(self, start):
+        # type: (int) -> bytes
+        """The interned, undecoded string at byte offset start of the page."""
+        end = self.data.index(b"\0", start)
+        return self.string_table.intern(bytes(self.data[start:end]))
+
+    def get_string(self, row, index, raw=False):
+        # type: (int, int, bool) -> ExcelString | bytes
+        """The string of column index in the (sub)row at position row of rows."""
+        start = int(self.string_offsets[row]) + int(
+            self.fields["column_{0}".format(index)][row]
+        )
+        if raw:
+            return self.read_string(start)
+        return ExcelString(self.read_string(start), self.string_table)
+
+    def get_value(self, row, index, raw=False):
+        # type: (int, int, bool) -> object
+        """The value of column index in the (sub)row at position row of rows."""
+        if self.header.columns[index].type == ExcelColumnDataType.String:
+            return self.get_string(row, index, raw)
+        return self.column(index)[row].item()
+
+    def strings(self, index, raw=False):
+        # type: (int, bool) -> list[ExcelString] | list[bytes]
+        """
+        The strings of a string column for every (sub)row, as handles that are
+        decoded on access, or as the undecoded bytes if raw is set.
+        """
+        if not raw:
+            string_table = self.string_table
+            return [
+                ExcelString(string, string_table)
+                for string in self.strings(index, raw=True)
+            ]
+        starts = self.get_string_starts(index)
+        # every string ends at the first null after its start
+        nulls = np.flatnonzero(np.frombuffer(self.data, np.uint8) == 0)
+        if len(starts) > 0 and (len(nulls) == 0 or starts.max() > nulls[-1]):
+            raise Exception("Unterminated string in a page of " + self.header.name)
+        ends = nulls[np.searchsorted(nulls, starts)]
+        view = memoryview(self.data)
+        intern = self.string_table.intern
+        return [
+            intern(bytes(view[start:end]))
+            for start, end in zip(starts.tolist(), ends.tolist())
+        ]
+
+    def share_columns(self, pages):
+        # type: (list[ExcelDataFile]) -> int
+        """
+        Use the arrays of pages, the same page in other languages, for the
+        columns that have the same values, and drop those columns from rows.
+        Call it on pages after the pages they share with, so they share the
+        final arrays of those.
+
+        Only the decoded copies of the shared columns are saved: data, the
+        page's decompressed bytes, still holds every column.
+
+        String columns are offsets into each page's own strings and are never
+        shared, their strings are interned in the StringTable instead.
+
+        Returns:
+            The number of shared columns.
+        """
+        pages = [
+            page
+            for page in pages
+            if np.array_equal(page.ids, self.ids)
+            and np.array_equal(page.subrow_ids, self.subrow_ids)
+        ]
+        for index, column in enumerate(self.header.columns):
+            name = "column_{0}".format(index)
+            if column.type == ExcelColumnDataType.String or name in self.shared:
+                continue
+            for page in pages:
+                if np.array_equal(page.fields[name], self.fields[name]):
+                    self.fields[name] = page.fields[name]
+                    self.shared.add(name)
+                    break
+        # keep a compact copy of the columns that are this page's own
+        names = [
+            name for name in self.rows.dtype.names or () if name not in self.shared
+        ]
+        if names:
+            self.rows = recfunctions.repack_fields(self.rows[names])
+        else:
+            self.rows = np.zeros(len(self.ids), np.dtype([]))
+        for name in names:
+            self.fields[name] = self.rows[name]
+        return len(self.shared)
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.ids)
+
+    def __repr__(self):
+        # type: () -> str
+        return "ExcelDataFile: {0}, {1} rows, {2} subrows".format(
+            self.header.name, len(self.row_ids), len(self.ids)
+        )
+
+
+class ExcelRow:
+    """One (sub)row of a page, values are read from the page when accessed."""
+
+    def __init__(self, page, pos):
+        # type: (ExcelDataFile, int) -> None
+        self.page = page
+        self.pos = pos
+        self.row_id = int(page.ids[pos])
+        self.subrow_id = int(page.subrow_ids[pos])
+
+    def __getitem__(self, index):
+        # type: (int) -> object
+        return self.page.get_value(self.pos, index)
+
+    def get(self, index, raw=False):
+        # type: (int, bool) -> object
+        """The value of a column, the undecoded bytes of strings if raw is set."""
+        return self.page.get_value(self.pos, index, raw)
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.page.header.columns)
+
+    def values(self, raw=False):
+        # type: (bool) -> list[object]
+        return [self.get(i, raw) for i in range(len(self))]
+
+    def __repr__(self):
+        # type: () -> str
+        return "ExcelRow: {0}.{1}: {2}".format(
+            self.row_id, self.subrow_id, self.values()
+        )
+
+
+class ExcelSheet:
+    """
+    A sheet in one language, its pages are read on first use and the most
+    recently used page_cache_size of them are kept.
+
+    sheet[row_id] is a row, or the list of subrows of a sheet with subrows,
+    and sheet[row_id, subrow_id] is one subrow. Either reads one page at most.
+
+    Strings are interned in string_table, pass the same table to the sheets
+    of other languages to share the strings they have in common.
+    """
+
+    def __init__(
+        self,
+        game_data,
+        name,
+        language=Language.English,
+        page_cache_size=8,
+        string_table=None,
+        header=None,
+    ):
+        # type: (GameData, str, int, int, StringTable | None, ExcelHeaderFile | None) -> None
+        self.game_data = game_data
+        self.name = name
+        self.string_table = string_table if string_table is not None else StringTable()
+        if header is None:
+            header = read_sheet_header(game_data, name)
+        self.header = header
+        self.language = get_sheet_language(self.header, language)
+        self.page_starts = [page.start_id for page in self.header.pagination]
+        self.page_cache_size = max(1, page_cache_size)
+        self.pages: OrderedDict[int, ExcelDataFile] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def has_subrows(self):
+        # type: () -> bool
+        return self.header.header.variant == VARIANT_SUBROWS
+
+    def get_page_path(self, page):
+        # type: (int) -> str
+        return get_exd_path(
+            self.name, self.header.pagination[page].start_id, self.language
+        )
+
+    def find_page(self, row_id):
+        # type: (int) -> int
+        """The page whose row id range has row_id, -1 if none has."""
+        page = bisect_right(self.page_starts, row_id) - 1
+        if page < 0:
+            return -1
+        pagination = self.header.pagination[page]
+        if row_id >= pagination.start_id + pagination.row_count:
+            return -1
+        return page
+
+    def cache_page(self, page, data_file):
+        # type: (int, ExcelDataFile) -> None
+        with self.lock:
+            self.pages[page] = data_file
+            self.pages.move_to_end(page)
+            while len(self.pages) > self.page_cache_size:
+                self.pages.popitem(last=False)
+
+    def get_page(self, page):
+        # type: (int) -> ExcelDataFile
+        with self.lock:
+            data_file = self.pages.get(page)
+            if data_file is not None:
+                self.hits += 1
+                self.pages.move_to_end(page)
+                return data_file
+            self.misses += 1
+        # read outside of the lock, a page read twice by racing threads is
+        # only wasted work
+        data_file = ExcelDataFile(
+            self.game_data.read_file_into(ParsedFileName(self.get_page_path(page))),
+            self.header,
+            self.string_table,
+        )
+        self.cache_page(page, data_file)
+        return data_file
+
+    def load_pages(self):
+        # type: () -> list[ExcelDataFile]
+        """Every page, those that aren't cached read in one sorted pass."""
+        with self.lock:
+            pages = dict(self.pages)
+        paths = {
+            self.get_page_path(page): page
+            for page in range(len(self.page_starts))
+            if page not in pages
+        }
+        for path, data in self.game_data.get_files(list(paths)):
+            page = paths[path]
+            pages[page] = ExcelDataFile(data, self.header, self.string_table)
+            self.cache_page(page, pages[page])
+        return [pages[page] for page in range(len(self.page_starts))]
+
+    def get(self, key, default=None):
+        # type: (int | tuple[int, int], object) -> ExcelRow | list[ExcelRow] | object
+        row_id, subrow_id = key if isinstance(key, tuple) else (key, None)
+        page = self.find_page(row_id)
+        if page < 0:
+            return default
+        data_file = self.get_page(page)
+        pos = data_file.find(row_id)
+        if pos < 0:
+            return default
+        subrows = [ExcelRow(data_file, i) for i in data_file.get_subrows(pos)]
+        if subrow_id is not None:
+            for subrow in subrows:
+                if subrow.subrow_id == subrow_id:
+                    return subrow
+            return default
+        if self.has_subrows:
+            return subrows
+        return subrows[0]
+
+    def __getitem__(self, key):
+        # type: (int | tuple[int, int]) -> ExcelRow | list[ExcelRow]
+        row = self.get(key)
+        if row is None:
+            raise KeyError(key)
+        return row
+
+    def __contains__(self, key):
+        # type: (int | tuple[int, int]) -> bool
+        return self.get(key) is not None
+
+    def __iter__(self):
+        # type: () -> Iterator[ExcelRow]
+        """Every (sub)row, in row id order."""
+        for page in range(len(self.page_starts)):
+            data_file = self.get_page(page)
+            for pos in range(len(data_file)):
+                yield ExcelRow(data_file, pos)
+
+    @property
+    def row_ids(self):
+        # type: () -> np.ndarray
+        return np.concatenate(
+            [np.zeros(0, np.uint32)] + [page.row_ids for page in self.load_pages()]
+        )
+
+    def column(self, index):
+        # type: (int) -> np.ndarray
+        """The values of one column for every (sub)row of every page."""
+        return np.concatenate([page.column(index) for page in self.load_pages()])
+
+    def strings(self, index, raw=False):
+        # type: (int, bool) -> list[ExcelString] | list[bytes]
+        return [
+            string
+            for page in self.load_pages()
+            for string in page.strings(index, raw)
+        ]
+
+    def stats(self):
+        # type: () -> dict[str, int]
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "cached": len(self.pages)}
+
+    @property
+    def row_count(self):
+        # type: () -> int
+        """
+        The number of rows, from the header. Iterating a sheet with subrows
+        yields more, one for every subrow.
+        """
+        return self.header.header.row_count
+
+    def __repr__(self):
+        # type: () -> str
+        return "ExcelSheet: {0} ({1}), {2} rows".format(
+            self.name, self.language.name, self.row_count
+        )
+
+
+def load_sheets(game_data, name, languages=None, workers=4):
+    # type: (GameData, str, Iterable[int] | None, int) -> dict[Language, ExcelSheet]
+    """
+    Read every page of a sheet in each of languages, all the languages of the
+    sheet by default, on a pool of workers threads. Inflating pages and
+    decoding their rows release the GIL, so the languages load in parallel.
+
+    The sheets share their header and StringTable, and the decoded columns
+    of each page are shared with the same page in the languages before it
+    where their values are equal, see ExcelDataFile.share_columns. The first
+    language keeps all of its columns, and every page of every language
+    stays cached in its sheet with its decompressed bytes, so this saves the
+    decoded copies of untranslated columns, not the pages themselves.
+
+    Returns:
+        The sheet of every language, untranslated sheets are one sheet in
+        None_ returned for every language asked for.
+    """
+    header = read_sheet_header(game_data, name)
+    if languages is None:
+        languages = header.languages
+    string_table = StringTable()
+    sheets: dict[Language, ExcelSheet] = {}
+    loaded: dict[Language, ExcelSheet] = {}
+    for language in languages:
+        sheet_language = get_sheet_language(header, language)
+        if sheet_language not in loaded:
+            loaded[sheet_language] = ExcelSheet(
+                game_data,
+                name,
+                sheet_language,
+                len(header.pagination),
+                string_table,
+                header,
+            )
+        sheets[Language(language)] = loaded[sheet_language]
+
+    tasks = [
+        (sheet, page)
+        for sheet in loaded.values()
+        for page in range(len(header.pagination))
+    ]
+    with ThreadPoolExecutor(
+        max(1, workers), thread_name_prefix="luminapie-sheet"
+    ) as executor:
+        pages = list(executor.map(lambda task: task[0].get_page(task[1]), tasks))
+    count = len(header.pagination)
+    for page in range(count):
+        # the same page in every language, in the order the sheets were loaded
+        same_page = pages[page::count]
+        for i in range(1, len(same_page)):
+            same_page[i].share_columns(same_page[:i])
+    return sheets
@@ -0,0 +1,348 @@
+"""
+Bulk extraction of game files to disk.
+
+    python -m luminapie extract GAME OUTPUT --paths uld_names.txt --path exd/root.exl
+    python -m luminapie extract GAME OUTPUT --hash-range ffxiv:exd
+    python -m luminapie extract GAME OUTPUT --hash-range ffxiv:ui --dictionary paths.lppd
+
+Work is spread over a process pool in batches of files that sit next to each
+other in the same dat file. Every file is written to a temporary name and
+renamed into place, and finished files are appended to a journal, so running
+the same command again after it was killed only extracts what is left.
+
+Only standard files can be read so far. Empty, model and texture files are
+journaled as skipped with their type, they don't fail the run and aren't
+retried by later runs.
+"""
+from luminapie.game_data import GameData, ParsedFileName, get_category_id
+from luminapie.path_dictionary import PathDictionary, read_path_list
+from luminapie.sqpack import SqPackFileInfo
+from luminapie.enums import SqPackFileType
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import os
+import time
+
+JOURNAL_NAME = ".luminapie-extract.journal"
+
+# set in each worker process by init_worker
+worker_game_data = None  # type: GameData | None
+
+
+def parse_hash_range(value):
+    # type: (str) -> tuple[str, int, int, int]
+    """Parse REPO:CATEGORY[:START-END], category by name or hex id, hashes in hex."""
+    parts = value.split(":")
+    if len(parts) not in (2, 3):
+        raise argparse.ArgumentTypeError(
+            "expected REPO:CATEGORY[:START-END], got {0}".format(value)
+        )
+    category = get_category_id(parts[1])
+    if category is None:
+        category = int(parts[1], 16)
+    start, end = 0, (1 << 64) - 1
+    if len(parts) == 3:
+        start, end = (int(bound, 16) for bound in parts[2].split("-"))
+    return parts[0], category, start, end
+
+
+def hash_output_path(repo, category, hash):
+    # type: (str, int, int) -> str
+    return "/".join(
+        [
+            "_hashes",
+            repo,
+            "{0:02x}".format(category),
+            "{0:08x}".format(hash >> 32),
+            "{0:08x}".format(hash & 0xFFFFFFFF),
+        ]
+    )
+
+
+def collect(game_data, args):
+    # type: (GameData, argparse.Namespace) -> dict[str, tuple[int, int, int | ParsedFileName]]
+    """
+    Every requested file as output path -> (repository, category, file), file
+    being a ParsedFileName or an index1 hash.
+    """
+    items: dict[str, tuple[int, int, int | ParsedFileName]] = {}
+    paths = list(args.path)
+    for path_list in args.paths:
+        paths.extend(read_path_list(path_list))
+    for file in ParsedFileName.from_many(paths):
+        items[file.path] = (game_data.get_repo_index(file.repo), file.category_id, file)
+
+    # files already requested by path keep their name instead of their hash
+    named = {(repo_index, file.index) for repo_index, _, file in items.values()}
+    dictionary = None  # type: PathDictionary | None
+    if args.dictionary is not None and args.hash_range:
+        dictionary = PathDictionary(args.dictionary)
+    for repo_name, category, start, end in args.hash_range:
+        repo_index = game_data.get_repo_index(repo_name)
+        repo_category = game_data.repositories[repo_index].get_category(category)
+        if repo_category is None:
+            continue
+        index = repo_category.load()
+        for pos in index.find_range(start, end):
+            hash = index.hashes[pos]
+            if (repo_index, hash) in named:
+                continue
+            if index.data[pos] & 0b1:
+                # a hash shared by several files, the synonym table names them
+                for path, _, _ in index.synonyms.get(hash, ()):
+                    items[path] = (repo_index, category, ParsedFileName(path))
+                continue
+            path = dictionary.get(hash) if dictionary is not None else None
+            if path is not None:
+                items[path] = (repo_index, category, ParsedFileName(path))
+                continue
+            items[hash_output_path(repo_name, category, hash)] = (
+                repo_index,
+                category,
+                hash,
+            )
+    if dictionary is not None:
+        dictionary.close()
+    return items
+
+
+def plan(game_data, items, done, batch_size):
+    # type: (GameData, dict[str, tuple[int, int, int | ParsedFileName]], set[str], int) -> tuple[list[list[tuple[str, int, str, int]]], list[str]]
+    """
+    Resolve the files that aren't done yet and batch them by dat file and offset.
+
+    Returns:
+        The batches of (output path, repository, dat file, offset) and the
+        output paths that aren't in any index.
+    """
+    located: list[tuple[int, str, int, str]] = []
+    missing: list[str] = []
+    for output, (repo_index, category, file) in items.items():
+        if output in done:
+            continue
+        try:
+            path, offset = game_data.repositories[repo_index].locate(file, category)
+        except KeyError:
+            missing.append(output)
+            continue
+        located.append((repo_index, path, offset, output))
+    located.sort()
+
+    batches: list[list[tuple[str, int, str, int]]] = []
+    for i in range(0, len(located), batch_size):
+        batches.append(
+            [
+                (output, repo_index, path, offset)
+                for repo_index, path, offset, output in located[i : i + batch_size]
+            ]
+        )
+    return batches, missing
+
+
+def init_worker(game_data):
+    # type: (GameData) -> None
+    global worker_game_data
+    worker_game_data = game_data
+
+
+def get_output_file(output_dir, output):
+    # type: (str, str) -> str
+    """
+    Where an output path is written in output_dir. Raises ValueError for paths
+    that would end up outside of it, whether they were requested, named by a
+    synonym table or by a path dictionary.
+    """
+    parts = output.split("/")
+    if (
+        os.path.isabs(output)
+        or os.path.splitdrive(output)[0]
+        or any(part == ".." or "\\" in part for part in parts)
+    ):
+        raise ValueError("Refusing to extract outside of the output: " + output)
+    return os.path.join(output_dir, *parts)
+
+
+def write_atomic(path, data):
+    # type: (str, bytes | bytearray) -> None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = "{0}.{1}.part".format(path, os.getpid())
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def extract_batch(output_dir, batch):
+    # type: (str, list[tuple[str, int, str, int]]) -> tuple[list[tuple[str, int]], list[tuple[str, str]], list[tuple[str, str]]]
+    """
+    Extract one batch in a worker.
+
+    Returns:
+        (output path, size) of the written files, (output path, file type) of
+        the files of a type that can't be read and (output path, error) of the
+        files that failed.
+    """
+    written: list[tuple[str, int]] = []
+    skipped: list[tuple[str, str]] = []
+    failed: list[tuple[str, str]] = []
+    for output, repo_index, path, offset in batch:
+        repo = worker_game_data.repositories[repo_index]
+        try:
+            with repo.pool.borrow(path) as dat:
+                file_info = SqPackFileInfo(dat.read_at(offset, 24), offset)
+                if file_info.type != SqPackFileType.Standard:
+                    skipped.append((output, file_info.type.name))
+                    continue
+                data = dat.read_file_into(offset)
+        except Exception as e:
+            failed.append((output, str(e)))
+            continue
+        try:
+            write_atomic(get_output_file(output_dir, output), data)
+        except (OSError, ValueError) as e:
+            failed.append((output, str(e)))
+            continue
+        written.append((output, len(data)))
+    return written, skipped, failed
+
+
+def read_journal(path):
+    # type: (str) -> tuple[set[str], dict[str, str]]
+    """
+    The extracted output paths of a journal, and the skipped ones with their
+    file type. Skipped files are journaled as "output path<TAB>file type".
+    """
+    done: set[str] = set()
+    skipped: dict[str, str] = {}
+    if not os.path.exists(path):
+        return done, skipped
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            # a line cut short by a kill is ignored, the file is extracted again
+            if not line.endswith("\n"):
+                continue
+            output, _, file_type = line.rstrip("\n").partition("\t")
+            if file_type:
+                skipped[output] = file_type
+            else:
+                done.add(output)
+    return done, skipped
+
+
+def report(files, size, seconds, total):
+    # type: (int, int, float, int) -> None
+    seconds = max(seconds, 1e-9)
+    print(
+        "{0}/{1} files, {2:.1f} MB, {3:.0f} files/s, {4:.1f} MB/s".format(
+            files, total, size / (1 << 20), files / seconds, size / seconds / (1 << 20)
+        ),
+        flush=True,
+    )
+
+
+def run(args):
+    # type: (argparse.Namespace) -> int
+    journal_path = args.journal or os.path.join(args.output, JOURNAL_NAME)
+    game_data = GameData(
+        args.game,
+        load_schema=False,
+        max_open_files=args.max_open_files,
+        index_cache_dir=args.index_cache,
+    )
+    items = collect(game_data, args)
+    done, skipped = read_journal(journal_path)
+    batches, missing = plan(game_data, items, done | skipped.keys(), args.batch)
+    total = sum(len(batch) for batch in batches)
+    print(
+        "{0} files requested, {1} already extracted, {2} skipped, {3} not found, "
+        "{4} to go".format(
+            len(items),
+            len(done & items.keys()),
+            len(skipped.keys() & items.keys()),
+            len(missing),
+            total,
+        )
+    )
+    for output in missing[:20]:
+        print("Not found: " + output)
+
+    os.makedirs(args.output, exist_ok=True)
+    files = 0
+    size = 0
+    failures: list[tuple[str, str]] = []
+    skipped_types: dict[str, int] = {}
+    start = last_report = time.perf_counter()
+    with open(journal_path, "a", encoding="utf-8") as journal, ProcessPoolExecutor(
+        args.workers, initializer=init_worker, initargs=(game_data,)
+    ) as executor:
+        futures = [
+            executor.submit(extract_batch, args.output, batch) for batch in batches
+        ]
+        for future in as_completed(futures):
+            written, skipped_files, failed = future.result()
+            journal.writelines(output + "\n" for output, _ in written)
+            journal.writelines(
+                "{0}\t{1}\n".format(output, file_type)
+                for output, file_type in skipped_files
+            )
+            journal.flush()
+            for _, file_type in skipped_files:
+                skipped_types[file_type] = skipped_types.get(file_type, 0) + 1
+            files += len(written)
+            size += sum(length for _, length in written)
+            failures.extend(failed)
+            now = time.perf_counter()
+            if now - last_report >= args.report_interval:
+                report(files, size, now - start, total)
+                last_report = now
+    report(files, size, time.perf_counter() - start, total)
+    game_data.close()
+
+    for file_type, count in sorted(skipped_types.items()):
+        print(
+            "Skipped {0} {1} files, their type can't be read".format(count, file_type)
+        )
+    for output, error in failures[:20]:
+        print("Failed: {0}: {1}".format(output, error))
+    if failures:
+        print("{0} files failed, run again to retry them".format(len(failures)))
+    return 1 if failures else 0
+
+
+def add_arguments(parser):
+    # type: (argparse.ArgumentParser) -> None
+    parser.add_argument("game", help="game folder, the one containing sqpack")
+    parser.add_argument("output", help="folder to extract into")
+    parser.add_argument(
+        "--path", action="append", default=[], help="game path to extract"
+    )
+    parser.add_argument(
+        "--paths",
+        action="append",
+        default=[],
+        help="text file with one game path per line",
+    )
+    parser.add_argument(
+        "--hash-range",
+        action="append",
+        default=[],
+        type=parse_hash_range,
+        metavar="REPO:CATEGORY[:START-END]",
+        help="every index entry of a category, optionally within a hex hash range",
+    )
+    parser.add_argument(
+        "--dictionary",
+        help="path dictionary naming the files of hash ranges, see 'paths build'",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch", type=int, default=64, help="files per task")
+    parser.add_argument("--journal", help="defaults to OUTPUT/" + JOURNAL_NAME)
+    parser.add_argument("--index-cache", help="folder for parsed index caches")
+    parser.add_argument("--max-open-files", type=int, default=16)
+    parser.add_argument("--report-interval", type=float, default=5.0)
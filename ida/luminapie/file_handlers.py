@@ -37,3 +37,61 @@ def get_sqpack_index2(root, path):
     for file in get_files(os.path.join(root, "sqpack", path)):
         if file.endswith(".index2"):
             yield file
+
+
+def get_sqpack_category(path):
+    # type: (str) -> int
+    """The category id from an index or dat file name, e.g. 0x0A for 0a0000.win32.index."""
+    return int(os.path.basename(path)[0:2], 16)
+
+
+class SqPackCatalog:
+    """
+    The index and dat files of one repository folder, read in one os.scandir
+    pass and shared by all of its SqPacks.
+    """
+
+    def __init__(self, root, path):
+        # type: (str, str) -> None
+        self.folder = os.path.join(root, "sqpack", path)
+        self.index_files: list[str] = []
+        self.index2_files: list[str] = []
+        # path without extension, e.g. .../0a0000.win32 -> dat number -> dat file
+        self.data_files: dict[str, dict[int, str]] = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                stem, _, ext = entry.path.rpartition(".")
+                if ext == "index":
+                    self.index_files.append(entry.path)
+                elif ext == "index2":
+                    self.index2_files.append(entry.path)
+                elif ext.startswith("dat") and ext[3:].isdigit():
+                    self.data_files.setdefault(stem, {})[int(ext[3:])] = entry.path
+        self.index_files.sort()
+        self.index2_files.sort()
+
+    def get_data_files(self, index_path, count):
+        # type: (str, int) -> list[str]
+        """
+        The dat files of an index numbered below count, positioned by their
+        number so data file ids index them. A missing dat file before the last
+        present one keeps its path, opening it raises instead of reading
+        another dat.
+        """
+        stem = index_path.rpartition(".")[0]
+        files = self.data_files.get(stem, {})
+        numbers = [number for number in files if number < count]
+        if len(numbers) == 0:
+            return []
+        return [
+            files.get(number, "{0}.dat{1}".format(stem, number))
+            for number in range(max(numbers) + 1)
+        ]
+
+    def __repr__(self):
+        # type: () -> str
+        return "SqPackCatalog: {0} ({1} index files, {2} dat files)".format(
+            self.folder,
+            len(self.index_files),
+            sum(len(files) for files in self.data_files.values()),
+        )
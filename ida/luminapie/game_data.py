@@ -1,20 +1,248 @@
-from luminapie.sqpack import SqPack, SqPackIndexHashTable
-from luminapie.file_handlers import get_game_data_folders, get_sqpack_index
+from luminapie.sqpack import (
+    PARALLEL_THRESHOLD,
+    SqPack,
+    SqPackFileReader,
+    SqPackIndexHashTable,
+)
+from luminapie.pool import SqPackPool
+from luminapie.cache import FileCache
+from luminapie.index import SqPackIndex, load_index_cache, save_index_cache
+from luminapie.file_handlers import (
+    SqPackCatalog,
+    get_game_data_folders,
+    get_sqpack_category,
+)
 from luminapie.se_crc import Crc32
 from luminapie.exdschema import get_definitions
 from luminapie.definitions import SemanticVersion
+from luminapie.enums import SqPackCatergories
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from itertools import groupby
+from typing import Iterable, Iterator
+import hashlib
 import os
+import sys
+import threading
+import warnings
+import weakref
 
 crc = Crc32()
+# every live GameData, so a forked child can drop the state it inherited
+instances: "weakref.WeakSet[GameData]" = weakref.WeakSet()
+
+
+def after_fork_in_child():
+    # type: () -> None
+    for game_data in list(instances):
+        game_data.after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=after_fork_in_child)
+
+
+@lru_cache(256)
+def get_category_id(category):
+    # type: (str) -> int | None
+    """The SqPackCatergories id of a path's first folder, e.g. 0x0A for exd."""
+    try:
+        return SqPackCatergories[category.upper()]
+    except KeyError:
+        return None
+
+
+def get_repo_name(folder):
+    # type: (str) -> str
+    """The repository of a path's second folder: ex1, ex2 and so on, else ffxiv."""
+    return folder if folder[:2] == "ex" and folder[2:3].isdigit() else "ffxiv"
+
+
+class RepositoryCategory:
+    """The index files of one category in a repository, e.g. every 0a00xx.win32.index chunk."""
+
+    def __init__(self, repository, category, index_files, index2_files=None):
+        # type: (Repository, int, list[str], list[str] | None) -> None
+        self.repository = repository
+        self.category = category
+        # pack id -> .index file and its dat files, the pack id is stored in the index
+        self.index_files = index_files
+        # the .index2 files in the same order, None if any of them is missing
+        self.index2_files = index2_files
+        self.data_files: list[list[str]] = []
+        self.sqpacks: dict[int, SqPack] = {}
+        self.index = None  # type: SqPackIndex | None
+        self.index2 = None  # type: SqPackIndex | None
+
+    def get_index_cache_path(self, index2=False):
+        # type: (bool) -> str
+        root_hash = hashlib.sha1(
+            os.path.abspath(self.repository.root).encode("utf-8")
+        ).hexdigest()
+        return os.path.join(
+            self.repository.index_cache_dir,
+            "{0}-{1:02x}{2}-{3}.lpic".format(
+                self.repository.name,
+                self.category,
+                "-index2" if index2 else "",
+                root_hash[:16],
+            ),
+        )
+
+    def get_index_cache_key(self, index2=False):
+        # type: (bool) -> list
+        key: list = [repr(self.repository.version), sys.byteorder]
+        for file in self.index2_files if index2 else self.index_files:
+            stat = os.stat(file)
+            key.append([os.path.basename(file), stat.st_size, stat.st_mtime_ns])
+        return key
+
+    def load(self, index2=False):
+        # type: (bool) -> SqPackIndex
+        """The index of the .index files, or of the .index2 files if index2 is set."""
+        index = self.index2 if index2 else self.index
+        if index is not None:
+            return index
+        with self.repository.lock:
+            index = self.index2 if index2 else self.index
+            if index is None:
+                loaded = None
+                if self.repository.index_cache_dir is not None:
+                    loaded = self.load_cached(index2)
+                if loaded is None:
+                    loaded = self.parse(index2)
+                # index last, other threads take a set index as fully loaded
+                self.data_files, index = loaded
+                if index2:
+                    self.index2 = index
+                else:
+                    self.index = index
+        return index
+
+    def load_cached(self, index2=False):
+        # type: (bool) -> tuple[list[list[str]], SqPackIndex] | None
+        repo = self.repository
+        cached = load_index_cache(
+            self.get_index_cache_path(index2), self.get_index_cache_key(index2)
+        )
+        if cached is None:
+            return None
+        header, index = cached
+        folder = os.path.join(repo.root, "sqpack", repo.name)
+        data_files = [
+            [os.path.join(folder, file) for file in files]
+            for files in header["data_files"]
+        ]
+        return data_files, index
+
+    def parse(self, index2=False):
+        # type: (bool) -> tuple[list[list[str]], SqPackIndex]
+        repo = self.repository
+        tables: list[tuple[int, bytes, bytes, bytes, int]] = []
+        data_files: list[list[str]] = []
+        index_files = self.index2_files if index2 else self.index_files
+        for pack_id, file in enumerate(index_files):
+            sqpack = SqPack(repo.root, file, repo.use_mmap)
+            sqpack.discover_data_files(repo.get_catalog())
+            tables.append(
+                (
+                    pack_id,
+                    sqpack.get_index_hash_table_bytes(sqpack.index_header),
+                    sqpack.get_index_synonym_table_bytes(sqpack.index_header),
+                    sqpack.get_index_dir_table_bytes(sqpack.index_header),
+                    sqpack.index_header.index_data_offset,
+                )
+            )
+            # everything needed from the index file is parsed now, don't hold its handle
+            sqpack.close()
+            if not index2:
+                self.sqpacks[pack_id] = sqpack
+            data_files.append(sqpack.data_files)
+        index = SqPackIndex.from_tables(tables, index2)
+
+        if repo.index_cache_dir is not None:
+            header = {
+                "data_files": [
+                    [os.path.basename(file) for file in files] for files in data_files
+                ]
+            }
+            try:
+                save_index_cache(
+                    self.get_index_cache_path(index2),
+                    self.get_index_cache_key(index2),
+                    header,
+                    index,
+                )
+            except OSError as e:
+                warnings.warn(
+                    "Could not write index cache for {0}/{1:02x}: {2}".format(
+                        repo.name, self.category, e
+                    ),
+                    RuntimeWarning,
+                )
+        return data_files, index
+
+    def has_index2(self):
+        # type: () -> bool
+        return self.index2_files is not None
+
+    def get_sqpack(self, pack_id):
+        # type: (int) -> SqPack
+        """The index SqPack of a pack id, opened on first use when the index came from a cache."""
+        sqpack = self.sqpacks.get(pack_id)
+        if sqpack is None:
+            repo = self.repository
+            sqpack = SqPack(repo.root, self.index_files[pack_id], repo.use_mmap)
+            sqpack.load_index_header()
+            sqpack.data_files = self.data_files[pack_id]
+            sqpack.close()
+            sqpack = self.sqpacks.setdefault(pack_id, sqpack)
+        return sqpack
+
+    def close(self):
+        # type: () -> None
+        for index in (self.index, self.index2):
+            if index is not None:
+                index.close()
+        self.index = None
+        self.index2 = None
+
+    def __repr__(self):
+        # type: () -> str
+        return "RepositoryCategory: {0}/{1:02x} ({2} index files, {3}, {4})".format(
+            self.repository.name,
+            self.category,
+            len(self.index_files),
+            "index loaded" if self.index is not None else "index not loaded",
+            "index2 loaded" if self.index2 is not None else "index2 not loaded",
+        )
 
 
 class Repository:
-    def __init__(self, name, root):
-        # type: (str, str) -> None
+    def __init__(
+        self,
+        name,
+        root,
+        use_mmap=False,
+        max_open_files=16,
+        index_cache_dir=None,
+        executor=None,
+        parallel_threshold=PARALLEL_THRESHOLD,
+    ):
+        # type: (str, str, bool, int, str | None, Executor | None, int) -> None
         self.root = root
         self.name = name
-        self.sqpacks: list[SqPack] = []
-        self.index: dict[int, tuple[SqPackIndexHashTable, SqPack]] = {}
+        self.use_mmap = use_mmap
+        self.index_cache_dir = index_cache_dir
+        self.executor = executor
+        self.parallel_threshold = parallel_threshold
+        self.pool = SqPackPool(root, max_open_files, use_mmap)
+        # guards lazy loading, lookups and reads themselves don't need it
+        self.lock = threading.RLock()
+        # discovered on first use, each category's index is loaded on its first lookup
+        self.categories = None  # type: dict[int, RepositoryCategory] | None
+        # the folder's index and dat files, scanned once on first use
+        self.catalog = None  # type: SqPackCatalog | None
         self.expansion_id = 0
         self.get_expansion_id()
 
@@ -40,26 +268,185 @@ class Repository:
         else:
             self.version = SemanticVersion(0, 0, 0, 0)
 
+    def get_catalog(self):
+        # type: () -> SqPackCatalog
+        catalog = self.catalog
+        if catalog is None:
+            with self.lock:
+                if self.catalog is None:
+                    self.catalog = SqPackCatalog(self.root, self.name)
+                catalog = self.catalog
+        return catalog
+
+    def discover_categories(self):
+        # type: () -> dict[int, RepositoryCategory]
+        categories = self.categories
+        if categories is not None:
+            return categories
+        with self.lock:
+            if self.categories is None:
+                if not hasattr(self, "version"):
+                    self.parse_version()
+                catalog = self.get_catalog()
+                index_files: dict[int, list[str]] = {}
+                for file in catalog.index_files:
+                    index_files.setdefault(get_sqpack_category(file), []).append(file)
+                index2_files = set(catalog.index2_files)
+                self.categories = {}
+                for category, files in index_files.items():
+                    files2 = [file + "2" for file in files]  # type: list[str] | None
+                    if not index2_files.issuperset(files2):
+                        files2 = None
+                    self.categories[category] = RepositoryCategory(
+                        self, category, files, files2
+                    )
+            return self.categories
+
+    def get_category(self, category):
+        # type: (int) -> RepositoryCategory | None
+        return self.discover_categories().get(category)
+
     def setup_indexes(self):
         # type: () -> None
-        for file in get_sqpack_index(self.root, self.name):
-            self.sqpacks.append(SqPack(self.root, file))
+        """Load the index of every category now instead of on first lookup."""
+        for category in self.discover_categories().values():
+            category.load()
+
+    def find_index(self, hash, category=None, index2=False):
+        # type: (int, int | None, bool) -> tuple[RepositoryCategory, int]
+        """The category holding an index1 (or index2) hash and its position there."""
+        if category is not None:
+            categories = [self.get_category(category)]
+        else:
+            categories = self.discover_categories().values()
+        for repo_category in categories:
+            if repo_category is None:
+                continue
+            pos = repo_category.load(index2).find(hash)
+            if pos != -1:
+                return repo_category, pos
+        raise KeyError(hash)
+
+    def list_folder(self, folder, category=None):
+        # type: (int | str, int | None) -> list[int]
+        """
+        The index1 hashes of every file in a folder, sorted.
+
+        Args:
+            folder: The folder hash, or its path, e.g. "exd", which also picks
+                the category when none is given.
+            category: Only look in this category, all of them by default.
+        """
+        if isinstance(folder, str):
+            folder = folder.lower().strip("/")
+            if category is None:
+                category = get_category_id(folder.split("/")[0])
+            folder = crc.calc(folder.encode("utf-8"))
+        if category is not None:
+            categories = [self.get_category(category)]
+        else:
+            categories = self.discover_categories().values()
+        hashes: list[int] = []
+        for repo_category in categories:
+            if repo_category is None:
+                continue
+            index = repo_category.load()
+            hashes.extend(index.hashes[pos] for pos in index.find_folder(folder))
+        return sorted(hashes)
+
+    def find_entry(self, hash, category=None):
+        # type: (int | ParsedFileName, int | None) -> tuple[RepositoryCategory, SqPackIndexHashTable, int]
+        """
+        The category, hash table entry and pack id of a file.
+
+        ParsedFileNames are looked up by the hash of their full path in the
+        .index2 files if their category has them, and colliding paths are told
+        apart by the synonym tables. Plain ints are index1 hashes.
+        """
+        path = None
+        index2 = False
+        if isinstance(hash, ParsedFileName):
+            file = hash
+            category = file.category_id
+            path = file.path
+            if category is not None:
+                repo_category = self.get_category(category)
+                index2 = repo_category is not None and repo_category.has_index2()
+            hash = file.index2 if index2 else file.index
+        repo_category, pos = self.find_index(hash, category, index2)
+        entry, pack = repo_category.load(index2).entry(pos, path)
+        return repo_category, entry, pack
+
+    def get_index(self, hash, category=None):
+        # type: (int | ParsedFileName, int | None) -> tuple[SqPackIndexHashTable, SqPack]
+        repo_category, entry, pack = self.find_entry(hash, category)
+        return entry, repo_category.get_sqpack(pack)
+
+    def locate(self, hash, category=None):
+        # type: (int | ParsedFileName, int | None) -> tuple[str, int]
+        """The dat file holding a file and the offset of the file within it."""
+        repo_category, entry, pack = self.find_entry(hash, category)
+        data_files = repo_category.data_files[pack]
+        return data_files[entry.data_file_id()], entry.data_file_offset()
+
+    def get_file(self, hash, category=None):
+        # type: (int | ParsedFileName, int | None) -> list[bytes]
+        path, offset = self.locate(hash, category)
+        with self.pool.borrow(path) as dat:
+            return dat.read_file(offset, self.executor, self.parallel_threshold)
+
+    def iter_file(self, hash, category=None):
+        # type: (int | ParsedFileName, int | None) -> Iterator[bytes]
+        path, offset = self.locate(hash, category)
+        with self.pool.borrow(path) as dat:
+            yield from dat.iter_file(offset)
+
+    def read_file_into(self, hash, category=None):
+        # type: (int | ParsedFileName, int | None) -> bytearray
+        path, offset = self.locate(hash, category)
+        with self.pool.borrow(path) as dat:
+            return dat.read_file_into(offset)
 
-        for sqpack in self.sqpacks:
-            sqpack.discover_data_files()
-            for indexes in sqpack.hash_table:
-                self.index[indexes.hash] = [indexes, sqpack]
+    def readinto(self, hash, buffer, category=None):
+        # type: (int | ParsedFileName, bytearray | memoryview, int | None) -> int
+        path, offset = self.locate(hash, category)
+        with self.pool.borrow(path) as dat:
+            return dat.readinto(offset, buffer)
 
-    def get_index(self, hash):
-        # type: (int) -> tuple[SqPackIndexHashTable, SqPack]
-        return self.index[hash]
+    def read_range(self, hash, start, length, category=None):
+        # type: (int | ParsedFileName, int, int, int | None) -> bytes
+        path, offset = self.locate(hash, category)
+        with self.pool.borrow(path) as dat:
+            return dat.read_range(offset, start, length)
 
-    def get_file(self, hash):
-        # type: (int) -> bytes
-        index, sqpack = self.get_index(hash)
-        id = index.data_file_id()
-        offset = index.data_file_offset()
-        return SqPack(self.root, sqpack.data_files[id]).read_file(offset)
+    def open_file(self, hash, category=None):
+        # type: (int | ParsedFileName, int | None) -> SqPackFileReader
+        path, offset = self.locate(hash, category)
+        dat = self.pool.acquire(path)
+        try:
+            return SqPackFileReader(dat, offset, lambda: self.pool.release(dat))
+        except BaseException:
+            self.pool.release(dat)
+            raise
+
+    def after_fork(self, executor):
+        # type: (Executor | None) -> None
+        self.lock = threading.RLock()
+        self.executor = executor
+        self.pool.after_fork()
+
+    def reset(self):
+        # type: () -> None
+        """Forget the loaded indexes and open dat files, they are loaded again on use."""
+        self.close()
+        self.categories = None
+        self.catalog = None
+
+    def close(self):
+        # type: () -> None
+        self.pool.close()
+        for category in (self.categories or {}).values():
+            category.close()
 
     def __repr__(self):
         # type: () -> str
@@ -69,12 +456,92 @@ class Repository:
 
 
 class GameData:
-    def __init__(self, root, load_schema=True):
-        # type: (str, bool) -> None
+    def __init__(
+        self,
+        root,
+        load_schema=True,
+        use_mmap=False,
+        max_open_files=16,
+        index_cache_dir=None,
+        decompress_workers=0,
+        parallel_threshold=PARALLEL_THRESHOLD,
+        file_cache_bytes=0,
+    ):
+        # type: (str, bool, bool, int, str | None, int, int, int) -> None
         self.root = root
         self.repositories: dict[int, Repository] = {}
         self.load_schema = load_schema
-        self.setup()
+        self.use_mmap = use_mmap
+        # upper bound of open dat files per repository
+        self.max_open_files = max_open_files
+        # folder for parsed index caches, None disables caching
+        self.index_cache_dir = index_cache_dir
+        # threads inflating the blocks of files of at least parallel_threshold bytes
+        self.decompress_workers = decompress_workers
+        self.parallel_threshold = parallel_threshold
+        self.executor = None  # type: ThreadPoolExecutor | None
+        if decompress_workers > 0:
+            self.executor = ThreadPoolExecutor(
+                decompress_workers, thread_name_prefix="luminapie-inflate"
+            )
+        # decompressed files kept by get_file/get_files, 0 disables the cache
+        self.file_cache_bytes = file_cache_bytes
+        self.file_cache = None  # type: FileCache | None
+        if file_cache_bytes > 0:
+            self.file_cache = FileCache(file_cache_bytes)
+        try:
+            self.setup()
+        except BaseException:
+            # don't leak the executor threads and the repositories set up so far
+            self.close()
+            raise
+        instances.add(self)
+
+    def get_options(self):
+        # type: () -> dict[str, object]
+        """The keyword arguments this GameData was created with."""
+        return {
+            "load_schema": self.load_schema,
+            "use_mmap": self.use_mmap,
+            "max_open_files": self.max_open_files,
+            "index_cache_dir": self.index_cache_dir,
+            "decompress_workers": self.decompress_workers,
+            "parallel_threshold": self.parallel_threshold,
+            "file_cache_bytes": self.file_cache_bytes,
+        }
+
+    def __getstate__(self):
+        # type: () -> dict[str, object]
+        # handles, threads and indexes stay behind, the new process reopens them
+        # lazily and maps the same index cache files when index_cache_dir is set
+        state = {"root": self.root, "options": self.get_options()}
+        if hasattr(self, "schema"):
+            state["schema"] = self.schema
+        return state
+
+    def __setstate__(self, state):
+        # type: (dict[str, object]) -> None
+        options = dict(state["options"], load_schema=False)
+        self.__init__(state["root"], **options)
+        self.load_schema = state["options"]["load_schema"]
+        if "schema" in state:
+            self.schema = state["schema"]
+
+    def after_fork(self):
+        # type: () -> None
+        """
+        Drop what a forked child can't share with its parent: open dat files,
+        locks and executor threads. Loaded indexes are kept, the child reads
+        them copy-on-write, or shares the read-only mapping of a cached index.
+        """
+        if self.executor is not None:
+            self.executor = ThreadPoolExecutor(
+                self.decompress_workers, thread_name_prefix="luminapie-inflate"
+            )
+        if self.file_cache is not None:
+            self.file_cache.lock = threading.Lock()
+        for repo in self.repositories.values():
+            repo.after_fork(self.executor)
 
     def get_repo_index(self, folder):
         # type: (str) -> int
@@ -87,20 +554,199 @@ class GameData:
         # type: () -> None
         for folder in get_game_data_folders(self.root):
             self.repositories[self.get_repo_index(folder)] = Repository(
-                folder, self.root
+                folder,
+                self.root,
+                self.use_mmap,
+                self.max_open_files,
+                self.index_cache_dir,
+                self.executor,
+                self.parallel_threshold,
             )
 
+        # indexes are loaded per category on first lookup
         for folder in self.repositories:
-            repo = self.repositories[folder]
-            repo.parse_version()
-            repo.setup_indexes()
+            self.repositories[folder].parse_version()
 
         if self.load_schema:
             self.schema = get_definitions(self.repositories[0].version)
 
+    def refresh(self):
+        # type: () -> list[str]
+        """
+        Re-read the version of every repository, e.g. after the game was patched.
+
+        Repositories whose version changed drop their loaded indexes, open dat
+        files and cached files, and load them again on their next lookup. Don't
+        call this while other threads are reading.
+
+        Returns:
+            The names of the repositories that changed.
+        """
+        changed: list[str] = []
+        for repo_index, repo in self.repositories.items():
+            version = repo.version
+            repo.parse_version()
+            if repo.version != version:
+                repo.reset()
+                if self.file_cache is not None:
+                    self.file_cache.invalidate(repo_index)
+                changed.append(repo.name)
+        return changed
+
+    def get_repository(self, file):
+        # type: (ParsedFileName) -> Repository
+        return self.repositories[self.get_repo_index(file.repo)]
+
     def get_file(self, file):
-        # type: (ParsedFileName) -> bytes
-        return self.repositories[self.get_repo_index(file.repo)].get_file(file.index)
+        # type: (ParsedFileName) -> list[bytes]
+        """
+        The inflated blocks of a file, from the file cache when it is enabled.
+
+        The cache doesn't re-read the game version, call refresh() after the
+        game was patched or cached files may be stale.
+        """
+        repo_index = self.get_repo_index(file.repo)
+        repo = self.repositories[repo_index]
+        if self.file_cache is None:
+            return repo.get_file(file)
+        key = (repo_index, file.path)
+        data = self.file_cache.get(key, repo.version)
+        if data is None:
+            data = repo.get_file(file)
+            self.file_cache.put(key, repo.version, data)
+        return list(data)
+
+    def get_files(self, files, missing_ok=False):
+        # type: (Iterable[ParsedFileName | str], bool) -> Iterator[tuple[ParsedFileName | str, list[bytes]]]
+        """
+        Read many files, in dat file and offset order instead of request order.
+
+        Every path is resolved before anything is read, so random seeks across
+        the dat files become one sequential pass per dat file.
+
+        Args:
+            files: ParsedFileNames or plain paths.
+            missing_ok: Skip files that aren't in the index instead of raising
+                KeyError before anything is read.
+
+        Returns:
+            (key, data) pairs, key being the object passed in for that file.
+        """
+        requests: list[
+            tuple[int, str, int, int, ParsedFileName, ParsedFileName | str]
+        ] = []
+        cached: list[tuple[ParsedFileName | str, list[bytes]]] = []
+        keys = list(files)
+        parsed = iter(
+            ParsedFileName.from_many(
+                [key for key in keys if not isinstance(key, ParsedFileName)]
+            )
+        )
+        for key in keys:
+            file = key if isinstance(key, ParsedFileName) else next(parsed)
+            repo_index = self.get_repo_index(file.repo)
+            if self.file_cache is not None:
+                data = self.file_cache.get(
+                    (repo_index, file.path), self.repositories[repo_index].version
+                )
+                if data is not None:
+                    cached.append((key, list(data)))
+                    continue
+            try:
+                path, offset = self.repositories[repo_index].locate(file)
+            except KeyError:
+                if missing_ok:
+                    continue
+                raise
+            requests.append((repo_index, path, offset, len(requests), file, key))
+        requests.sort(key=lambda request: request[:4])
+        yield from cached
+
+        for (repo_index, path), group in groupby(
+            requests, key=lambda request: request[:2]
+        ):
+            repo = self.repositories[repo_index]
+            with repo.pool.borrow(path) as dat:
+                for _, _, offset, _, file, key in group:
+                    data = dat.read_file(
+                        offset, repo.executor, repo.parallel_threshold
+                    )
+                    if self.file_cache is not None:
+                        self.file_cache.put(
+                            (repo_index, file.path), repo.version, data
+                        )
+                    yield key, data
+
+    def iter_file(self, file):
+        # type: (ParsedFileName) -> Iterator[bytes]
+        """The file's blocks, inflated one at a time as they are iterated."""
+        return self.get_repository(file).iter_file(file)
+
+    def read_file_into(self, file):
+        # type: (ParsedFileName) -> bytearray
+        """The whole file in one preallocated buffer, its blocks are never joined."""
+        return self.get_repository(file).read_file_into(file)
+
+    def readinto(self, file, buffer):
+        # type: (ParsedFileName, bytearray | memoryview) -> int
+        """Inflate the file into buffer, which must be at least its raw size."""
+        return self.get_repository(file).readinto(file, buffer)
+
+    def read_range(self, file, offset, length):
+        # type: (ParsedFileName, int, int) -> bytes
+        """
+        Read length bytes at offset of the uncompressed file.
+
+        Only the blocks overlapping the range are read and inflated, so this is
+        cheap for headers or single rows of large files.
+        """
+        return self.get_repository(file).read_range(file, offset, length)
+
+    def open_file(self, file):
+        # type: (ParsedFileName) -> SqPackFileReader
+        """A read-only, streaming file object, close it to free its dat reader."""
+        return self.get_repository(file).open_file(file)
+
+    def cache_stats(self):
+        # type: () -> dict[str, int]
+        if self.file_cache is None:
+            return {}
+        return self.file_cache.stats()
+
+    def pool_stats(self):
+        # type: () -> dict[str, int]
+        stats = {"hits": 0, "misses": 0, "evictions": 0, "open": 0}
+        for repo in self.repositories.values():
+            for key, value in repo.pool.stats().items():
+                stats[key] += value
+        return stats
+
+    def close(self):
+        # type: () -> None
+        for repo in self.repositories.values():
+            repo.close()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        # type: () -> GameData
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # type: (type, BaseException, object) -> None
+        self.close()
+
+    def load_sheet(self, name, languages=None, workers=4):
+        # type: (str, Iterable[int] | None, int) -> dict[Language, ExcelSheet]
+        """
+        Every page of an excel sheet in each of languages, loaded concurrently,
+        see luminapie.excel_data.load_sheets. Needs the excel extra (numpy).
+        """
+        # excel_data imports this module, and numpy is optional
+        from luminapie.excel_data import load_sheets
+
+        return load_sheets(self, name, languages, workers)
 
     def get_exd_schema(self, key):
         # type: (str) -> list[Definition]
@@ -119,11 +765,52 @@ class ParsedFileName:
         self.path = path.lower().strip()
         parts = self.path.split("/")
         self.category = parts[0]
-        self.index = crc.calc_index(self.path)
-        self.index2 = crc.calc_index2(self.path)
-        self.repo = parts[1]
-        if self.repo[0] != "e" or self.repo[1] != "x" or not self.repo[2].isdigit():
-            self.repo = "ffxiv"
+        self.category_id = get_category_id(self.category)
+        self.repo = get_repo_name(parts[1])
+
+    @classmethod
+    def from_many(cls, paths):
+        # type: (Iterable[str]) -> list[ParsedFileName]
+        """
+        Parse and hash many paths in one pass.
+
+        The paths are lowercased up front and split in a single loop that sets
+        each ParsedFileName's attributes and hashes directly, without an
+        __init__ call per path. calc_indexes_many computes the CRC of every
+        folder once. Paths without a folder raise like ParsedFileName(path).
+
+        Callers parsing millions of paths can pause the cyclic garbage
+        collector around this, it is triggered over and over for nothing.
+        """
+        paths = [path.lower().strip() for path in paths]
+        indexes = crc.calc_indexes_many(paths)
+        new = cls.__new__
+        files: list[ParsedFileName] = []
+        for path, (index, index2) in zip(paths, indexes):
+            category, separator, rest = path.partition("/")
+            if not separator:
+                files.append(cls(path))
+                continue
+            file = new(cls)
+            file.path = path
+            file.category = category
+            file.category_id = get_category_id(category)
+            file.repo = get_repo_name(rest.partition("/")[0])
+            file.index = index
+            file.index2 = index2
+            files.append(file)
+        return files
+
+    # hashed on first use, lookups only need index2 where the category has it
+    @cached_property
+    def index(self):
+        # type: () -> int
+        return crc.calc_index(self.path)
+
+    @cached_property
+    def index2(self):
+        # type: () -> int
+        return crc.calc_index2(self.path)
 
     def __repr__(self):
         # type: () -> str
@@ -0,0 +1,379 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import json
+import mmap
+import os
+import struct
+import sys
+import typing
+from luminapie.sqpack import SqPackIndexHashTable
+
+
+# entries of .index2 hash tables are a uint32 full path hash and the data word
+INDEX2_ENTRY_SIZE = 8
+SYNONYM_ENTRY_SIZE = 0x100
+DIR_ENTRY_SIZE = 16
+
+
+def split_hash_table(table, index2=False):
+    # type: (bytes, bool) -> tuple[array, array]
+    """Split a raw index1 or index2 hash table into its hash and data word columns."""
+    if index2:
+        words = array("I", table)
+        if sys.byteorder == "big":
+            words.byteswap()
+        return array("Q", words[0::2]), words[1::2]
+    view = memoryview(table)
+    hashes = array("Q", view.cast("Q")[0::2].tobytes())
+    data = array("I", view.cast("I")[2::4].tobytes())
+    if sys.byteorder == "big":
+        hashes.byteswap()
+        data.byteswap()
+    return hashes, data
+
+
+def parse_synonym_table(table, index2=False):
+    # type: (bytes, bool) -> list[tuple[int, str, int]]
+    """
+    The (hash, path, data word) entries of a raw synonym table.
+
+    Every entry is 0x100 bytes: the uint64 index1 hash (uint32 full path hash
+    and padding in index2), the data word, its position and the 0xF0 byte,
+    null terminated path.
+    """
+    entries: list[tuple[int, str, int]] = []
+    for offset in range(0, len(table) - SYNONYM_ENTRY_SIZE + 1, SYNONYM_ENTRY_SIZE):
+        hash, data = struct.unpack_from("<QI", table, offset)
+        if index2:
+            hash &= 0xFFFFFFFF
+        path = table[offset + 16 : offset + SYNONYM_ENTRY_SIZE].split(b"\0", 1)[0]
+        # the table ends with an entry without a path
+        if path != b"":
+            entries.append((hash, path.decode("utf-8", "replace"), data))
+    return entries
+
+
+def parse_dir_table(table, hash_table_offset):
+    # type: (bytes, int) -> tuple[array, array, array]
+    """
+    The folder hashes of a raw dir index segment, with the position and count
+    of each folder's entries in the index file's hash table.
+
+    Every entry is 16 bytes: the uint32 folder hash, then the file offset and
+    size of the folder's hash table entries and padding.
+    """
+    words = array("I", table[: len(table) - len(table) % DIR_ENTRY_SIZE])
+    if sys.byteorder == "big":
+        words.byteswap()
+    starts = array("I", ((offset - hash_table_offset) // 16 for offset in words[1::4]))
+    counts = array("I", (size // 16 for size in words[2::4]))
+    return words[0::4], starts, counts
+
+
+class SqPackIndex:
+    """
+    Hash table entries of one or more index files, stored as parallel arrays
+    sorted by hash: uint64 hash, uint32 data word and uint16 pack id.
+
+    Hashes shared by several paths are flagged as synonyms in the hash table,
+    their entries are kept by path in synonyms.
+
+    Index1 hashes are the folder hash << 32 | the file name hash, so every
+    folder is one run of entries. The folders of the dir index segments are
+    kept sorted with the first and past-the-end position of their run, taken
+    from the offsets and sizes in the segments.
+    """
+
+    def __init__(
+        self,
+        hashes=None,
+        data=None,
+        packs=None,
+        mapping=None,
+        synonyms=None,
+        folders=None,
+        folder_starts=None,
+        folder_ends=None,
+    ):
+        # type: (array, array, array, mmap.mmap, dict[int, list[tuple[str, int, int]]], array, array, array) -> None
+        # the columns are arrays, or memoryviews over mapping when loaded from a cache file
+        self.hashes = hashes if hashes is not None else array("Q")
+        self.data = data if data is not None else array("I")
+        self.packs = packs if packs is not None else array("H")
+        self.folders = folders if folders is not None else array("I")
+        self.folder_starts = folder_starts if folder_starts is not None else array("I")
+        self.folder_ends = folder_ends if folder_ends is not None else array("I")
+        self.mapping = mapping
+        # hash -> (path, data word, pack id) of every path sharing it
+        self.synonyms = synonyms if synonyms is not None else {}
+
+    @staticmethod
+    def from_tables(tables, index2=False):
+        # type: (list[tuple[int, bytes, bytes, bytes, int]], bool) -> SqPackIndex
+        """
+        Build an index from the raw tables of its index files, as (pack id, hash
+        table, synonym table, dir index segment, file offset of the hash table)
+        tuples.
+        """
+        hashes = array("Q")
+        data = array("I")
+        packs = array("H")
+        synonyms: dict[int, list[tuple[str, int, int]]] = {}
+        folder_set: set[int] = set()
+        # per index file: its dir segment's folders, starts and counts, entry count
+        dirs: list[tuple[array, array, array, int]] = []
+        for pack_id, table, synonym_table, dir_table, table_offset in tables:
+            pack_hashes, pack_data = split_hash_table(table, index2)
+            hashes.extend(pack_hashes)
+            data.extend(pack_data)
+            packs.extend(array("H", [pack_id]) * len(pack_hashes))
+            for hash, path, word in parse_synonym_table(synonym_table, index2):
+                synonyms.setdefault(hash, []).append((path, word, pack_id))
+            if not index2:
+                folders, starts, counts = parse_dir_table(dir_table, table_offset)
+                dirs.append((folders, starts, counts, len(pack_hashes)))
+                folder_set.update(folders)
+
+        # one sort of hash << 32 | position keys, the position breaks ties so the
+        # last inserted of duplicate hashes stays last, like a dict
+        keys = sorted(hash << 32 | i for i, hash in enumerate(hashes))
+        order = array("I", (key & 0xFFFFFFFF for key in keys))
+        hashes = array("Q", (key >> 32 for key in keys))
+        del keys
+        index = SqPackIndex(
+            hashes,
+            array("I", map(data.__getitem__, order)),
+            array("H", map(packs.__getitem__, order)),
+            synonyms=synonyms,
+        )
+        index.folders = array("I", sorted(folder_set))
+        for folder in index.folders:
+            # every index file's hash table is sorted too, so the folder's run in
+            # the merged index starts after the entries of smaller hashes of all
+            # of them, which is where each one's dir segment puts the folder
+            start = count = 0
+            for folders, starts, counts, total in dirs:
+                pos = bisect_left(folders, folder)
+                if pos < len(folders) and folders[pos] == folder:
+                    start += starts[pos]
+                    count += counts[pos]
+                else:
+                    start += starts[pos] if pos < len(folders) else total
+            if not index.is_folder_run(folder, start, start + count):
+                # the segments don't match the hash tables, e.g. truncated
+                run = index.find_range(folder << 32, folder << 32 | 0xFFFFFFFF)
+                start, count = run.start, len(run)
+            index.folder_starts.append(start)
+            index.folder_ends.append(start + count)
+        return index
+
+    def is_folder_run(self, folder, start, end):
+        # type: (int, int, int) -> bool
+        """Whether [start, end) are exactly the positions of a folder's entries."""
+        hashes = self.hashes
+        if not 0 <= start <= end <= len(hashes):
+            return False
+        if start > 0 and hashes[start - 1] >> 32 >= folder:
+            return False
+        if end < len(hashes) and hashes[end] >> 32 <= folder:
+            return False
+        return start == end or (
+            hashes[start] >> 32 == folder and hashes[end - 1] >> 32 == folder
+        )
+
+    def find(self, hash):
+        # type: (int) -> int
+        """Position of hash in the index, or -1 if it is not present."""
+        pos = bisect_right(self.hashes, hash) - 1
+        if pos < 0 or self.hashes[pos] != hash:
+            return -1
+        return pos
+
+    def find_range(self, start, end):
+        # type: (int, int) -> range
+        """Positions of every entry with a hash in [start, end]."""
+        return range(
+            bisect_left(self.hashes, start), bisect_right(self.hashes, end)
+        )
+
+    def find_folder(self, folder):
+        # type: (int) -> range
+        """
+        Positions of every entry in a folder, by its hash.
+
+        Folders missing from the dir index segments, e.g. of index files whose
+        segment is empty, fall back to a search of the hashes.
+        """
+        pos = bisect_left(self.folders, folder)
+        if pos == len(self.folders) or self.folders[pos] != folder:
+            return self.find_range(folder << 32, folder << 32 | 0xFFFFFFFF)
+        return range(self.folder_starts[pos], self.folder_ends[pos])
+
+    def resolve(self, pos, path=None):
+        # type: (int, str | None) -> tuple[int, int]
+        """
+        The data word and pack id of the entry at pos.
+
+        Synonyms are told apart by comparing path with the paths in the synonym
+        table, raises KeyError if none matches.
+        """
+        data = self.data[pos]
+        if data & 0b1 == 0:
+            return data, self.packs[pos]
+        for synonym_path, synonym_data, pack in self.synonyms.get(
+            self.hashes[pos], ()
+        ):
+            if synonym_path == path:
+                return synonym_data, pack
+        raise KeyError(path if path is not None else self.hashes[pos])
+
+    def entry(self, pos, path=None):
+        # type: (int, str | None) -> tuple[SqPackIndexHashTable, int]
+        """The hash table entry at pos and its pack id, see resolve."""
+        data, pack = self.resolve(pos, path)
+        entry = SqPackIndexHashTable(struct.pack("<QII", self.hashes[pos], data, 0))
+        return entry, pack
+
+    def close(self):
+        # type: () -> None
+        if self.mapping is not None:
+            for column in self.get_columns():
+                column.release()
+            self.hashes, self.data, self.packs = array("Q"), array("I"), array("H")
+            self.folders = array("I")
+            self.folder_starts = array("I")
+            self.folder_ends = array("I")
+            self.mapping.close()
+            self.mapping = None
+
+    def get_columns(self):
+        # type: () -> tuple[array, ...]
+        """Every array, in the order of the cache file and widest first."""
+        return (
+            self.hashes,
+            self.data,
+            self.folders,
+            self.folder_starts,
+            self.folder_ends,
+            self.packs,
+        )
+
+    def __contains__(self, hash):
+        # type: (int) -> bool
+        return self.find(hash) != -1
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.hashes)
+
+    def __repr__(self):
+        # type: () -> str
+        return "SqPackIndex: {0} entries, {1} folders".format(
+            len(self), len(self.folders)
+        )
+
+
+CACHE_MAGIC = b"LPIC"
+CACHE_FORMAT = 3
+
+
+def cache_data_offset(header_size):
+    # type: (int) -> int
+    # magic, format and header size, then the json header padded to 8 bytes
+    return (12 + header_size + 7) & ~7
+
+
+def read_index_cache_header(file):
+    # type: (typing.BinaryIO) -> tuple[dict, int] | None
+    if file.read(4) != CACHE_MAGIC:
+        return None
+    format, header_size = struct.unpack("<II", file.read(8))
+    if format != CACHE_FORMAT:
+        return None
+    header = json.loads(file.read(header_size).decode("utf-8"))
+    return header, cache_data_offset(header_size)
+
+
+def load_index_cache(path, key):
+    # type: (str, object) -> tuple[dict, SqPackIndex] | None
+    """
+    Memory-map a cache file written by save_index_cache.
+
+    Returns:
+        The cache header and the index, or None if the cache is missing,
+        unreadable or was written for a different key.
+    """
+    try:
+        with open(path, "rb") as f:
+            result = read_index_cache_header(f)
+            if result is None or result[0]["key"] != key:
+                return None
+            header, offset = result
+            count = header["count"]
+            folder_count = header["folder_count"]
+            size = offset + count * 14 + folder_count * 12
+            if os.fstat(f.fileno()).st_size != size:
+                return None
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+    view = memoryview(mapping)
+    columns: list[memoryview] = []
+    for format, length in (
+        ("Q", count),
+        ("I", count),
+        ("I", folder_count),
+        ("I", folder_count),
+        ("I", folder_count),
+        ("H", count),
+    ):
+        end = offset + length * struct.calcsize(format)
+        columns.append(view[offset:end].cast(format))
+        offset = end
+    view.release()
+    hashes, data, folders, folder_starts, folder_ends, packs = columns
+    synonyms: dict[int, list[tuple[str, int, int]]] = {}
+    for hash, path, word, pack in header["synonyms"]:
+        synonyms.setdefault(hash, []).append((path, word, pack))
+    return header, SqPackIndex(
+        hashes, data, packs, mapping, synonyms, folders, folder_starts, folder_ends
+    )
+
+
+def save_index_cache(path, key, header, index):
+    # type: (str, object, dict, SqPackIndex) -> None
+    """Atomically write index and header to path, tagged with key."""
+    synonyms = [
+        [hash, path, data, pack]
+        for hash, entries in index.synonyms.items()
+        for path, data, pack in entries
+    ]
+    header_bytes = json.dumps(
+        dict(
+            header,
+            key=key,
+            count=len(index),
+            folder_count=len(index.folders),
+            synonyms=synonyms,
+        )
+    ).encode("utf-8")
+    padding = cache_data_offset(len(header_bytes)) - 12 - len(header_bytes)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = "{0}.{1}.tmp".format(path, os.getpid())
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(CACHE_MAGIC)
+            f.write(struct.pack("<II", CACHE_FORMAT, len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b"\0" * padding)
+            for column in index.get_columns():
+                f.write(column.tobytes())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,287 @@
+"""
+Reverse lookup of index hashes to game paths.
+
+A dictionary file is built once from path lists and memory-mapped for lookups:
+
+    magic, format, path count, block count, paths per block, padding
+    uint64 index1 hashes, sorted, a path's number is its position here
+    uint32 index2 hashes, sorted
+    uint32 path number of every index2 hash
+    uint64 offset of every string block, and the end of the last one
+    string blocks, each zlib compressed paths joined by newlines
+
+Sorting by index1 hash puts the files of a folder next to each other, so the
+blocks compress well. Only the pages of the arrays that a binary search
+touches and the blocks that are read are loaded.
+"""
+from luminapie.excel import ExcelHeaderFile, ExcelListFile, get_exd_path
+from luminapie.game_data import GameData, ParsedFileName
+from luminapie.se_crc import Crc32
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Iterable
+import argparse
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+DICTIONARY_MAGIC = b"LPPD"
+DICTIONARY_FORMAT = 1
+DICTIONARY_HEADER = struct.Struct("<4sIIII12x")
+BLOCK_SIZE = 64
+
+
+def read_path_list(path):
+    # type: (str) -> list[str]
+    """
+    Game paths from a text file, one per line.
+
+    Quotes and trailing commas are stripped, so lists written by
+    ffxiv_extract_uld_names.py can be used as is.
+    """
+    paths: list[str] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip().rstrip(",").strip().strip('"').strip()
+            if line != "" and not line.startswith("#"):
+                paths.append(line)
+    return paths
+
+
+def get_excel_paths(game_data):
+    # type: (GameData) -> tuple[list[str], list[tuple[str, str]]]
+    """
+    exd/root.exl, the header of every sheet it lists and every page of those
+    sheets in each of their languages.
+
+    Returns:
+        The paths, and the (name, error) of every sheet whose header is
+        missing or can't be parsed. Only the header path of those is listed.
+    """
+    paths = ["exd/root.exl"]
+    skipped: list[tuple[str, str]] = []
+    root = ExcelListFile(game_data.get_file(ParsedFileName("exd/root.exl")))
+    for name in root.dict.values():
+        header_path = "exd/{0}.exh".format(name)
+        paths.append(header_path)
+        try:
+            header = ExcelHeaderFile(
+                game_data.get_file(ParsedFileName(header_path)), name
+            )
+            pages = [
+                get_exd_path(name, page.start_id, language)
+                for page in header.pagination
+                for language in header.languages
+            ]
+        except (KeyError, IndexError, ValueError, zlib.error) as e:
+            skipped.append((name, "{0}: {1}".format(type(e).__name__, e)))
+            continue
+        paths.extend(pages)
+    return paths, skipped
+
+
+class PathDictionary:
+    """A memory-mapped dictionary file, see build for writing one."""
+
+    def __init__(self, path, block_cache_size=64):
+        # type: (str, int) -> None
+        self.path = path
+        with open(path, "rb") as f:
+            self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = DICTIONARY_HEADER.unpack_from(self.mapping)
+        magic, format, count, block_count, block_size = header
+        if magic != DICTIONARY_MAGIC or format != DICTIONARY_FORMAT:
+            self.mapping.close()
+            raise Exception("Not a path dictionary: " + path)
+        if sys.byteorder == "big":
+            self.mapping.close()
+            raise Exception("Path dictionaries can only be read on little endian")
+        self.count = count
+        self.block_size = block_size
+        view = memoryview(self.mapping)
+        offset = DICTIONARY_HEADER.size
+        self.hashes = view[offset : offset + count * 8].cast("Q")
+        offset += count * 8
+        self.hashes2 = view[offset : offset + count * 4].cast("I")
+        offset += count * 4
+        self.ids2 = view[offset : offset + count * 4].cast("I")
+        offset += count * 4
+        self.block_offsets = view[offset : offset + (block_count + 1) * 8].cast("Q")
+        self.strings_offset = offset + (block_count + 1) * 8
+        view.release()
+        # recently used blocks, lookups of neighbouring hashes share them
+        self.get_block = lru_cache(block_cache_size)(self.read_block)
+
+    @staticmethod
+    def build(paths, output, block_size=BLOCK_SIZE):
+        # type: (Iterable[str], str, int) -> int
+        """
+        Write a dictionary of paths to output, atomically.
+
+        Paths are lowercased and deduplicated.
+
+        Returns:
+            The number of paths written.
+        """
+        unique = sorted({path.lower().strip() for path in paths} - {""})
+        hashes = Crc32().calc_indexes_many(unique)
+        order = sorted(range(len(unique)), key=lambda i: (hashes[i][0], unique[i]))
+        index1 = array("Q", [hashes[i][0] for i in order])
+        by_hash2 = sorted(range(len(order)), key=lambda i: hashes[order[i]][1])
+        index2 = array("I", [hashes[order[i]][1] for i in by_hash2])
+        ids2 = array("I", by_hash2)
+
+        blocks: list[bytes] = []
+        block_offsets = array("Q", [0])
+        for start in range(0, len(order), block_size):
+            block = "\n".join(unique[i] for i in order[start : start + block_size])
+            blocks.append(zlib.compress(block.encode("utf-8"), 9))
+            block_offsets.append(block_offsets[-1] + len(blocks[-1]))
+        if sys.byteorder == "big":
+            for column in (index1, index2, ids2, block_offsets):
+                column.byteswap()
+
+        directory = os.path.dirname(os.path.abspath(output))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = "{0}.{1}.tmp".format(output, os.getpid())
+        with open(temp_path, "wb") as f:
+            f.write(
+                DICTIONARY_HEADER.pack(
+                    DICTIONARY_MAGIC,
+                    DICTIONARY_FORMAT,
+                    len(order),
+                    len(blocks),
+                    block_size,
+                )
+            )
+            for column in (index1, index2, ids2, block_offsets):
+                f.write(column.tobytes())
+            for block in blocks:
+                f.write(block)
+        os.replace(temp_path, output)
+        return len(order)
+
+    def read_block(self, block):
+        # type: (int) -> list[str]
+        start = self.strings_offset + self.block_offsets[block]
+        end = self.strings_offset + self.block_offsets[block + 1]
+        return zlib.decompress(self.mapping[start:end]).decode("utf-8").split("\n")
+
+    def get_path(self, number):
+        # type: (int) -> str
+        block, pos = divmod(number, self.block_size)
+        return self.get_block(block)[pos]
+
+    def get_paths(self, hash):
+        # type: (int) -> list[str]
+        """Every known path with this index1 hash, usually one or none."""
+        start = bisect_left(self.hashes, hash)
+        end = bisect_right(self.hashes, hash, start)
+        return [self.get_path(number) for number in range(start, end)]
+
+    def get_paths2(self, hash):
+        # type: (int) -> list[str]
+        """Every known path with this index2 (full path) hash."""
+        start = bisect_left(self.hashes2, hash)
+        end = bisect_right(self.hashes2, hash, start)
+        return [self.get_path(self.ids2[pos]) for pos in range(start, end)]
+
+    def get(self, hash, default=None):
+        # type: (int, str | None) -> str | None
+        """The first known path with this index1 hash."""
+        pos = bisect_left(self.hashes, hash)
+        if pos == self.count or self.hashes[pos] != hash:
+            return default
+        return self.get_path(pos)
+
+    def paths(self):
+        # type: () -> Iterable[str]
+        """Every path, in index1 hash order."""
+        for block in range(len(self.block_offsets) - 1):
+            yield from self.read_block(block)
+
+    def close(self):
+        # type: () -> None
+        if self.mapping is not None:
+            for column in (self.hashes, self.hashes2, self.ids2, self.block_offsets):
+                column.release()
+            self.get_block.cache_clear()
+            self.mapping.close()
+            self.mapping = None
+
+    def __contains__(self, hash):
+        # type: (int) -> bool
+        return self.get(hash) is not None
+
+    def __len__(self):
+        # type: () -> int
+        return self.count
+
+    def __enter__(self):
+        # type: () -> PathDictionary
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # type: (type, BaseException, object) -> None
+        self.close()
+
+    def __repr__(self):
+        # type: () -> str
+        return "PathDictionary: {0} ({1} paths)".format(self.path, self.count)
+
+
+def run(args):
+    # type: (argparse.Namespace) -> int
+    if args.action == "build":
+        paths = list(args.path)
+        for path_list in args.paths:
+            paths.extend(read_path_list(path_list))
+        if args.game is not None:
+            with GameData(args.game, load_schema=False) as game_data:
+                excel_paths, skipped = get_excel_paths(game_data)
+            paths.extend(excel_paths)
+            for name, error in skipped[:20]:
+                print("Skipped sheet {0}: {1}".format(name, error))
+            if skipped:
+                print(
+                    "{0} sheets skipped, only their header paths were added".format(
+                        len(skipped)
+                    )
+                )
+        count = PathDictionary.build(paths, args.dictionary)
+        print(
+            "{0} paths, {1} bytes".format(count, os.path.getsize(args.dictionary))
+        )
+        return 0
+
+    with PathDictionary(args.dictionary) as dictionary:
+        missing = 0
+        for value in args.hashes:
+            hash = int(value, 16)
+            paths = dictionary.get_paths(hash) or dictionary.get_paths2(hash)
+            if not paths:
+                missing += 1
+            print("{0:x}: {1}".format(hash, ", ".join(paths) or "unknown"))
+    return 1 if missing else 0
+
+
+def add_arguments(parser):
+    # type: (argparse.ArgumentParser) -> None
+    actions = parser.add_subparsers(dest="action", required=True)
+    build = actions.add_parser("build", help="write a dictionary from path lists")
+    build.add_argument("dictionary", help="dictionary file to write")
+    build.add_argument("--path", action="append", default=[], help="game path")
+    build.add_argument(
+        "--paths",
+        action="append",
+        default=[],
+        help="text file with one game path per line, e.g. uld_names.txt",
+    )
+    build.add_argument("--game", help="add root.exl and every sheet of this game")
+
+    lookup = actions.add_parser("lookup", help="paths of index1 or index2 hashes")
+    lookup.add_argument("dictionary", help="dictionary file to read")
+    lookup.add_argument("hashes", nargs="+", help="hex hashes")
@@ -0,0 +1,104 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+from luminapie.sqpack import SqPack
+
+
+class SqPackPool:
+    """Bounded, least-recently-used pool of open dat file readers."""
+
+    def __init__(self, root, max_open=16, use_mmap=False):
+        # type: (str, int, bool) -> None
+        self.root = root
+        self.max_open = max(1, max_open)
+        self.use_mmap = use_mmap
+        self.sqpacks: OrderedDict[str, SqPack] = OrderedDict()
+        # readers still in use when they were evicted, closed on their last release
+        self.evicted: set[SqPack] = set()
+        self.borrows: dict[SqPack, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, path):
+        # type: (str) -> SqPack
+        with self.lock:
+            sqpack = self.sqpacks.get(path)
+            if sqpack is not None:
+                self.hits += 1
+                self.sqpacks.move_to_end(path)
+            else:
+                self.misses += 1
+                sqpack = SqPack(self.root, path, self.use_mmap)
+                self.sqpacks[path] = sqpack
+                while len(self.sqpacks) > self.max_open:
+                    self.evict()
+            self.borrows[sqpack] = self.borrows.get(sqpack, 0) + 1
+            return sqpack
+
+    def release(self, sqpack):
+        # type: (SqPack) -> None
+        with self.lock:
+            count = self.borrows.pop(sqpack) - 1
+            if count > 0:
+                self.borrows[sqpack] = count
+            elif sqpack in self.evicted:
+                self.evicted.discard(sqpack)
+                sqpack.close()
+
+    @contextmanager
+    def borrow(self, path):
+        # type: (str) -> SqPack
+        sqpack = self.acquire(path)
+        try:
+            yield sqpack
+        finally:
+            self.release(sqpack)
+
+    def evict(self):
+        # type: () -> None
+        """Drop the least recently used reader, the caller holds the lock."""
+        _, sqpack = self.sqpacks.popitem(last=False)
+        self.evictions += 1
+        if sqpack in self.borrows:
+            self.evicted.add(sqpack)
+        else:
+            sqpack.close()
+
+    def stats(self):
+        # type: () -> dict[str, int]
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "open": len(self.sqpacks) + len(self.evicted),
+            }
+
+    def close(self):
+        # type: () -> None
+        with self.lock:
+            for sqpack in self.sqpacks.values():
+                sqpack.close()
+            for sqpack in self.evicted:
+                sqpack.close()
+            self.sqpacks.clear()
+            self.evicted.clear()
+            self.borrows.clear()
+
+    def after_fork(self):
+        # type: () -> None
+        """Forget readers inherited from the parent process, reopening them on use."""
+        self.lock = threading.Lock()
+        for sqpack in list(self.sqpacks.values()) + list(self.evicted):
+            sqpack.close()
+        self.sqpacks.clear()
+        self.evicted.clear()
+        self.borrows.clear()
+
+    def __repr__(self):
+        # type: () -> str
+        return "SqPackPool: {0}/{1} open, {2}".format(
+            len(self.sqpacks), self.max_open, self.stats()
+        )
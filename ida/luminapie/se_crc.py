@@ -1,4 +1,101 @@
+from functools import lru_cache
+from typing import Iterable
+import zlib
+
+
 class Crc32:
+    """
+    Square Enix's CRC-32: the standard CRC-32 without the final inversion.
+
+    zlib.crc32 does the work, paths are hashed as utf-8. Folder CRCs are kept
+    in a bounded LRU memo, since path lists have thousands of files per
+    folder, and full path CRCs continue from the folder's CRC instead of
+    hashing the folder again.
+    """
+
+    def __init__(self, folder_cache_size=4096):
+        # type: (int) -> None
+        # folder -> zlib.crc32 of it, before SE's inversion
+        self.folder_crc = lru_cache(folder_cache_size)(self.calc_folder_crc)
+
+    def calc(self, value):
+        # type: (bytes) -> int
+        return zlib.crc32(value) ^ 0xFFFFFFFF
+
+    def calc_folder_crc(self, folder):
+        # type: (str) -> int
+        return zlib.crc32(folder.encode("utf-8"))
+
+    def calc_index(self, path):
+        # type: (str) -> int
+        folder, _, filename = path.rpartition("/")
+        foldercrc = self.folder_crc(folder) ^ 0xFFFFFFFF
+        filecrc = self.calc(filename.encode("utf-8"))
+        return foldercrc << 32 | filecrc
+
+    def calc_index2(self, path):
+        # type: (str) -> int
+        return self.calc(path.encode("utf-8"))
+
+    def calc_indexes(self, path):
+        # type: (str) -> tuple[int, int]
+        """calc_index and calc_index2 of path, hashing its folder at most once."""
+        folder, separator, filename = path.rpartition("/")
+        folder_crc = self.folder_crc(folder)
+        name = filename.encode("utf-8")
+        return (
+            (folder_crc ^ 0xFFFFFFFF) << 32 | zlib.crc32(name) ^ 0xFFFFFFFF,
+            zlib.crc32(b"/" + name if separator else name, folder_crc) ^ 0xFFFFFFFF,
+        )
+
+    def calc_many(self, values):
+        # type: (Iterable[bytes]) -> list[int]
+        crc32 = zlib.crc32
+        return [crc32(value) ^ 0xFFFFFFFF for value in values]
+
+    def calc_index_many(self, paths):
+        # type: (Iterable[str]) -> list[int]
+        """calc_index of every path."""
+        crc32 = zlib.crc32
+        folder_crc = self.folder_crc
+        hashes: list[int] = []
+        for path in paths:
+            folder, _, filename = path.rpartition("/")
+            hashes.append(
+                (folder_crc(folder) ^ 0xFFFFFFFF) << 32
+                | crc32(filename.encode("utf-8")) ^ 0xFFFFFFFF
+            )
+        return hashes
+
+    def calc_index2_many(self, paths):
+        # type: (Iterable[str]) -> list[int]
+        """calc_index2 of every path."""
+        crc32 = zlib.crc32
+        return [crc32(path.encode("utf-8")) ^ 0xFFFFFFFF for path in paths]
+
+    def calc_indexes_many(self, paths):
+        # type: (Iterable[str]) -> list[tuple[int, int]]
+        """calc_indexes of every path."""
+        crc32 = zlib.crc32
+        folder_crc = self.folder_crc
+        hashes: list[tuple[int, int]] = []
+        for path in paths:
+            folder, separator, filename = path.rpartition("/")
+            folder_value = folder_crc(folder)
+            name = filename.encode("utf-8")
+            hashes.append(
+                (
+                    (folder_value ^ 0xFFFFFFFF) << 32 | crc32(name) ^ 0xFFFFFFFF,
+                    crc32(b"/" + name if separator else name, folder_value)
+                    ^ 0xFFFFFFFF,
+                )
+            )
+        return hashes
+
+
+class PyCrc32:
+    """The original pure-Python slicing-by-16 implementation, kept as a reference."""
+
     def __init__(self):
         # type: () -> None
         self.poly = 0xEDB88320
@@ -0,0 +1,321 @@
+"""
+SE's rich text strings, the strings of EXD sheets among others.
+
+Text is UTF-8, with macros in between: 0x02, the macro code, the length of the
+payload as a packed integer, the payload and 0x03. A payload is a sequence of
+expressions: packed integers, placeholders, comparisons, parameters and
+nested strings.
+
+get_text never parses a payload, it jumps from macro to macro with bytes.find
+and the payload lengths. SeString parses every macro into its expressions.
+Both keep everything from a truncated or invalid macro on as text. A macro
+whose frame is valid but whose payload can't be parsed is skipped by get_text
+and kept unparsed, with its raw payload, by SeString.
+"""
+from luminapie.enums import MacroCode
+from typing import Union
+
+MACRO_START = b"\x02"
+MACRO_END = 0x03
+
+# macros that stand for a character in plain text
+MACRO_TEXT = {
+    MacroCode.NewLine: b"\n",
+    MacroCode.SoftHyphen: "\u00ad".encode("utf-8"),
+    MacroCode.NonBreakingSpace: "\u00a0".encode("utf-8"),
+    MacroCode.Hyphen: b"-",
+}
+
+BINARY_OPERATORS = {
+    0xE0: ">=",
+    0xE1: ">",
+    0xE2: "<=",
+    0xE3: "<",
+    0xE4: "==",
+    0xE5: "!=",
+}
+PARAMETER_NAMES = {0xE8: "lnum", 0xE9: "gnum", 0xEA: "lstr", 0xEB: "gstr"}
+STRING_EXPRESSION = 0xFF
+
+
+def read_packed_int(data, pos):
+    # type: (bytes, int) -> tuple[int, int]
+    """
+    The packed integer at pos and the position after it.
+
+    Values up to 0xCE are one byte, the value plus one. Larger ones are a
+    marker 0xF0 to 0xFE whose low bits, plus one, say which of the value's
+    big endian bytes follow.
+    """
+    marker = data[pos]
+    if marker < 0xD0:
+        return marker - 1, pos + 1
+    if not 0xF0 <= marker <= 0xFE:
+        raise ValueError("Invalid SeString integer {0:#x} at {1}".format(marker, pos))
+    flags = (marker + 1) & 0xF
+    value = 0
+    pos += 1
+    for byte in range(3, -1, -1):
+        if flags & (1 << byte):
+            value |= data[pos] << (byte * 8)
+            pos += 1
+    return value, pos
+
+
+def skip_macro(data, pos):
+    # type: (bytes, int) -> tuple[int, int, int]
+    """
+    The macro starting at pos, raises ValueError if it is truncated or invalid.
+
+    Returns:
+        Its code, the position of its payload and the position after it.
+    """
+    try:
+        length, start = read_packed_int(data, pos + 2)
+        end = start + length
+        valid = data[end] == MACRO_END
+    except (IndexError, ValueError):
+        valid = False
+    if not valid:
+        raise ValueError("Invalid SeString macro at {0}".format(pos))
+    return data[pos + 1], start, end + 1
+
+
+def get_text(data):
+    # type: (bytes) -> str
+    """The text of a string without its macros, but for those in MACRO_TEXT."""
+    pos = data.find(MACRO_START)
+    if pos < 0:
+        return data.decode("utf-8", "surrogateescape")
+    parts: list[bytes] = []
+    last = 0
+    while pos >= 0:
+        parts.append(data[last:pos])
+        try:
+            code, _, last = skip_macro(data, pos)
+        except ValueError:
+            # not a macro after all, the rest is kept as it is
+            last = pos
+            break
+        if code in MACRO_TEXT:
+            parts.append(MACRO_TEXT[code])
+        pos = data.find(MACRO_START, last)
+    parts.append(data[last:])
+    return b"".join(parts).decode("utf-8", "surrogateescape")
+
+
+class IntegerExpression:
+    def __init__(self, value):
+        # type: (int) -> None
+        self.value = value
+
+    def __repr__(self):
+        # type: () -> str
+        return str(self.value)
+
+
+class PlaceholderExpression:
+    """A value without operands, e.g. the current hour or the macro's color."""
+
+    def __init__(self, marker):
+        # type: (int) -> None
+        self.marker = marker
+
+    def __repr__(self):
+        # type: () -> str
+        return "[{0:#x}]".format(self.marker)
+
+
+class BinaryExpression:
+    def __init__(self, marker, left, right):
+        # type: (int, SeExpression, SeExpression) -> None
+        self.marker = marker
+        self.left = left
+        self.right = right
+
+    def __repr__(self):
+        # type: () -> str
+        return "[{0}{1}{2}]".format(
+            self.left, BINARY_OPERATORS[self.marker], self.right
+        )
+
+
+class ParameterExpression:
+    """A parameter passed to the string, e.g. lnum1 the first integer."""
+
+    def __init__(self, marker, operand):
+        # type: (int, SeExpression) -> None
+        self.marker = marker
+        self.operand = operand
+
+    def __repr__(self):
+        # type: () -> str
+        return "{0}{1}".format(PARAMETER_NAMES[self.marker], self.operand)
+
+
+class StringExpression:
+    def __init__(self, value):
+        # type: (SeString) -> None
+        self.value = value
+
+    def __repr__(self):
+        # type: () -> str
+        return repr(self.value.to_macro_string())
+
+
+SeExpression = Union[
+    IntegerExpression,
+    PlaceholderExpression,
+    BinaryExpression,
+    ParameterExpression,
+    StringExpression,
+]
+
+
+def read_expression(data, pos):
+    # type: (bytes, int) -> tuple[SeExpression, int]
+    """The expression at pos of a macro payload and the position after it."""
+    marker = data[pos]
+    if marker < 0xD0 or 0xF0 <= marker <= 0xFE:
+        value, pos = read_packed_int(data, pos)
+        return IntegerExpression(value), pos
+    if marker in BINARY_OPERATORS:
+        left, pos = read_expression(data, pos + 1)
+        right, pos = read_expression(data, pos)
+        return BinaryExpression(marker, left, right), pos
+    if marker in PARAMETER_NAMES:
+        operand, pos = read_expression(data, pos + 1)
+        return ParameterExpression(marker, operand), pos
+    if marker == STRING_EXPRESSION:
+        length, start = read_packed_int(data, pos + 1)
+        if start + length > len(data):
+            raise ValueError("Invalid SeString expression at {0}".format(pos))
+        return StringExpression(SeString(data[start : start + length])), start + length
+    return PlaceholderExpression(marker), pos + 1
+
+
+class TextPayload:
+    def __init__(self, data):
+        # type: (bytes) -> None
+        self.data = data
+
+    @property
+    def text(self):
+        # type: () -> str
+        return self.data.decode("utf-8", "surrogateescape")
+
+    def to_macro_string(self):
+        # type: () -> str
+        return self.text
+
+    def __repr__(self):
+        # type: () -> str
+        return "TextPayload: {0!r}".format(self.text)
+
+
+class MacroPayload:
+    def __init__(self, code, data, parse=True):
+        # type: (int, bytes, bool) -> None
+        self.code = code
+        self.data = data
+        self.expressions: list[SeExpression] = []
+        # False for a payload that couldn't be parsed, only data is set then
+        self.parsed = False
+        if parse:
+            self.parse()
+
+    def parse(self):
+        # type: () -> None
+        """Raises IndexError or ValueError if the payload is truncated or invalid."""
+        expressions: list[SeExpression] = []
+        pos = 0
+        while pos < len(self.data):
+            expression, pos = read_expression(self.data, pos)
+            expressions.append(expression)
+        self.expressions = expressions
+        self.parsed = True
+
+    @property
+    def name(self):
+        # type: () -> str
+        try:
+            return MacroCode(self.code).name
+        except ValueError:
+            return "{0:#x}".format(self.code)
+
+    @property
+    def text(self):
+        # type: () -> str
+        return MACRO_TEXT.get(self.code, b"").decode("utf-8")
+
+    def to_macro_string(self):
+        # type: () -> str
+        """The macro as <name(expression, ...)>, or <name:hex> if unparsed."""
+        if not self.parsed:
+            return "<{0}:{1}>".format(self.name, self.data.hex())
+        if not self.expressions:
+            return "<{0}>".format(self.name)
+        return "<{0}({1})>".format(
+            self.name, ",".join(repr(x) for x in self.expressions)
+        )
+
+    def __repr__(self):
+        # type: () -> str
+        return "MacroPayload: {0}".format(self.to_macro_string())
+
+
+class SeString:
+    """A string split into its text and its parsed macros."""
+
+    def __init__(self, data):
+        # type: (bytes | bytearray) -> None
+        self.data = bytes(data)
+        self.payloads: list[TextPayload | MacroPayload] = []
+        self.parse()
+
+    def parse(self):
+        # type: () -> None
+        pos = 0
+        while pos < len(self.data):
+            start = self.data.find(MACRO_START, pos)
+            end = len(self.data) if start < 0 else start
+            if end > pos:
+                self.payloads.append(TextPayload(self.data[pos:end]))
+            if start < 0:
+                break
+            try:
+                code, payload, pos = skip_macro(self.data, start)
+            except ValueError:
+                # like get_text, the rest is text
+                self.payloads.append(TextPayload(self.data[start:]))
+                break
+            data = self.data[payload : pos - 1]
+            try:
+                macro = MacroPayload(code, data)
+            except (IndexError, ValueError):
+                # skipped by get_text, kept here with its raw payload
+                macro = MacroPayload(code, data, parse=False)
+            self.payloads.append(macro)
+
+    @property
+    def macros(self):
+        # type: () -> list[MacroPayload]
+        return [x for x in self.payloads if isinstance(x, MacroPayload)]
+
+    @property
+    def text(self):
+        # type: () -> str
+        return get_text(self.data)
+
+    def to_macro_string(self):
+        # type: () -> str
+        """The text with every macro written as <name(expression, ...)>."""
+        return "".join(payload.to_macro_string() for payload in self.payloads)
+
+    def __str__(self):
+        # type: () -> str
+        return self.text
+
+    def __repr__(self):
+        # type: () -> str
+        return "SeString: {0!r}".format(self.to_macro_string())
@@ -1,8 +1,18 @@
 from luminapie.enums import SqPackFileType, SqPackPlatformId
-from io import BufferedReader
+import mmap
 import os
+import threading
 import zlib
-from luminapie.file_handlers import get_sqpack_files
+from luminapie.file_handlers import SqPackCatalog
+from concurrent.futures import Executor
+from typing import Callable, Iterator
+import io
+
+HAS_PREAD = hasattr(os, "pread")
+# files smaller than this are never worth handing to an executor
+PARALLEL_THRESHOLD = 1 << 20
+# blocks inflated per executor task, 16 blocks are ~256KB of output
+PARALLEL_BATCH = 16
 
 
 class SqPackFileInfo:
@@ -43,17 +53,15 @@ class DatBlockHeader:
 
 
 class SqPackHeader:
-    def __init__(self, file):
-        # type: (BufferedReader) -> None
-        self.magic = file.read(8)
-        self.platform_id = SqPackPlatformId(
-            int.from_bytes(file.read(1), byteorder="little")
-        )
-        self.unknown = file.read(3)
+    def __init__(self, bytes):
+        # type: (bytes) -> None
+        self.magic = bytes[0:8]
+        self.platform_id = SqPackPlatformId(bytes[8])
+        self.unknown = bytes[9:12]
         if self.platform_id != SqPackPlatformId.PS3:
-            self.size = int.from_bytes(file.read(4), byteorder="little")
-            self.version = int.from_bytes(file.read(4), byteorder="little")
-            self.type = int.from_bytes(file.read(4), byteorder="little")
+            self.size = int.from_bytes(bytes[12:16], byteorder="little")
+            self.version = int.from_bytes(bytes[16:20], byteorder="little")
+            self.type = int.from_bytes(bytes[20:24], byteorder="little")
         else:
             raise Exception("PS3 is not supported")
 
@@ -143,24 +151,87 @@ class SqPackIndexHashTable:
         )
 
 
+def decompress_block(block_header, payload):
+    # type: (DatBlockHeader, bytes) -> bytes
+    if block_header.dat_block_type == 32000:
+        return bytes(payload)
+    # zlib reads straight out of the mapping, no intermediate copy
+    return zlib.decompress(payload, wbits=-15)
+
+
+def decompress_blocks(blocks):
+    # type: (list[tuple[DatBlockHeader, bytes]]) -> list[bytes]
+    return [decompress_block(header, payload) for header, payload in blocks]
+
+
 class SqPack:
-    def __init__(self, root, path):
-        # type: (str, str) -> None
+    def __init__(self, root, path, use_mmap=False):
+        # type: (str, str, bool) -> None
         self.root = root
         self.path = path
-        self.file = open(path, "rb")
-        self.header = SqPackHeader(self.file)
+        self.use_mmap = use_mmap
+        # unbuffered, reads are positional so there is no shared cursor to race on
+        self.file = open(path, "rb", buffering=0)
+        self.view = None  # type: memoryview | None
+        # only needed where os.pread is missing (Windows)
+        self.lock = threading.Lock()
+        if use_mmap:
+            # reads become zero-copy slices of the mapping instead of seek/read pairs
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.mmap)
+        self.header = SqPackHeader(bytes(self.read_at(0, 24)))
+
+    def read_at(self, offset, size):
+        # type: (int, int) -> bytes | memoryview
+        """
+        Read size bytes at offset, as a memoryview slice when memory-mapped.
+
+        Safe to call from several threads at once.
+        """
+        if self.view is not None:
+            return self.view[offset : offset + size]
+        if HAS_PREAD:
+            return os.pread(self.file.fileno(), size, offset)
+        with self.lock:
+            self.file.seek(offset)
+            return self.file.read(size)
 
     def get_index_header(self):
         # type: () -> SqPackIndexHeader
-        self.file.seek(self.header.size)
-        return SqPackIndexHeader(self.file.read(1024))
+        return SqPackIndexHeader(bytes(self.read_at(self.header.size, 1024)))
+
+    def get_index_hash_table_bytes(self, index_header):
+        # type: (SqPackIndexHeader) -> bytes
+        return bytes(
+            self.read_at(index_header.index_data_offset, index_header.index_data_size)
+        )
+
+    def get_index_synonym_table_bytes(self, index_header):
+        # type: (SqPackIndexHeader) -> bytes
+        return bytes(
+            self.read_at(
+                index_header.synonym_data_offset, index_header.synonym_data_size
+            )
+        )
+
+    def get_index_dir_table_bytes(self, index_header):
+        # type: (SqPackIndexHeader) -> bytes
+        return bytes(
+            self.read_at(
+                index_header.dir_index_data_offset, index_header.dir_index_data_size
+            )
+        )
 
     def get_index_hash_table(self, index_header):
         # type: (SqPackIndexHeader) -> list[SqPackIndexHashTable]
-        self.file.seek(index_header.index_data_offset)
+        table = memoryview(
+            self.read_at(index_header.index_data_offset, index_header.index_data_size)
+        )
         entry_count = index_header.index_data_size // 16
-        return [SqPackIndexHashTable(self.file.read(16)) for _ in range(entry_count)]
+        return [
+            SqPackIndexHashTable(table[i * 16 : i * 16 + 16])
+            for i in range(entry_count)
+        ]
 
     def load_index_header(self):
         # type: () -> None
@@ -170,56 +241,252 @@ class SqPack:
         # type: () -> None
         self.hash_table = self.get_index_hash_table(self.index_header)
 
-    def discover_data_files(self):
-        # type: () -> None
+    def discover_data_files(self, catalog=None):
+        # type: (SqPackCatalog | None) -> None
+        """Find the dat files of this index, in a shared catalog if one is passed."""
         self.load_index_header()
-        self.load_hash_table()
-        self.data_files: list[str] = []
-        for file in get_sqpack_files(
-            self.root, self.path.rsplit(os.sep, 1)[0].split(os.sep)[-1]
-        ):
-            for i in range(0, self.index_header.number_of_data_file):
-                name = self.path.rsplit(".", 1)[0] + ".dat" + str(i)
-                if file == name:
-                    self.data_files.append(file)
+        if catalog is None:
+            catalog = SqPackCatalog(
+                self.root, os.path.basename(os.path.dirname(self.path))
+            )
+        self.data_files: list[str] = catalog.get_data_files(
+            self.path, self.index_header.number_of_data_file
+        )
 
-    def read_file(self, offset):
-        # type: (int) -> list[bytes]
+    def get_file_info(self, offset):
+        # type: (int) -> SqPackFileInfo
+        """The info of the file at offset, raises if its type can't be read."""
         if self.path.rsplit(".", 1)[1][0:3] != "dat":
             raise Exception("Not a data file")
-        self.file.seek(offset)
-        file_info_bytes = self.file.read(24)
-        file_info = SqPackFileInfo(file_info_bytes, offset)
-        data: list[bytes] = []
+        file_info = SqPackFileInfo(self.read_at(offset, 24), offset)
         if file_info.type == SqPackFileType.Empty:
             raise Exception(f"File located at 0x{hex(offset)} is empty.")
-        elif file_info.type == SqPackFileType.Standard:
-            data = self.read_standard_file(file_info)
-        else:
+        elif file_info.type != SqPackFileType.Standard:
             raise Exception("Type: " + str(file_info.type) + " not implemented.")
-        return data
+        return file_info
+
+    def read_file(self, offset, executor=None, parallel_threshold=PARALLEL_THRESHOLD):
+        # type: (int, Executor | None, int) -> list[bytes]
+        file_info = self.get_file_info(offset)
+        return self.read_standard_file(file_info, executor, parallel_threshold)
+
+    def iter_file(self, offset):
+        # type: (int) -> Iterator[bytes]
+        """Inflate the file at offset one block at a time."""
+        file_info = self.get_file_info(offset)
+        for _, block_header, payload in self.iter_standard_blocks(file_info):
+            yield decompress_block(block_header, payload)
 
-    def read_standard_file(self, file_info):
-        # type: (SqPackFileInfo) -> list[bytes]
-        block_bytes = self.file.read(file_info.number_of_blocks * 8)
-        data: list[bytes] = []
+    def readinto(self, offset, buffer):
+        # type: (int, bytearray | memoryview) -> int
+        """
+        Inflate the file at offset into buffer, block by block.
+
+        zlib can't inflate into an existing buffer, so each compressed block
+        is inflated into a temporary of its own size and copied into place.
+        Stored blocks are copied straight from the read payload. Either way the
+        blocks are never joined and the caller's buffer can be reused.
+
+        Args:
+            offset: The offset of the file in this dat file.
+            buffer: A writable buffer of at least the file's raw_file_size bytes.
+
+        Returns:
+            The number of bytes written.
+        """
+        return self.readinto_standard_file(self.get_file_info(offset), buffer)
+
+    def read_file_into(self, offset):
+        # type: (int) -> bytearray
+        """The file at offset as a single buffer, see readinto."""
+        file_info = self.get_file_info(offset)
+        buffer = bytearray(file_info.raw_file_size)
+        size = self.readinto_standard_file(file_info, buffer)
+        if size != len(buffer):
+            del buffer[size:]
+        return buffer
+
+    def read_range(self, offset, start, length):
+        # type: (int, int, int) -> bytes
+        """
+        Read part of the file at offset, inflating only the blocks that overlap it.
+
+        Args:
+            offset: The offset of the file in this dat file.
+            start: The first byte of the range in the uncompressed file.
+            length: The number of bytes to read, fewer are returned past the end.
+        """
+        if start < 0 or length < 0:
+            raise ValueError("Invalid range {0}+{1}".format(start, length))
+        file_info = self.get_file_info(offset)
+        end = min(start + length, file_info.raw_file_size)
+        block_bytes = self.read_at(
+            file_info.offset + 24, file_info.number_of_blocks * 8
+        )
+        data = bytearray()
+        block_start = 0
         for i in range(file_info.number_of_blocks):
+            if block_start >= end:
+                break
             block = DatStdFileBlockInfos(block_bytes[i * 8 : i * 8 + 8])
-            self.file.seek(file_info.offset + file_info.header_size + block.offset)
-            block_header = DatBlockHeader(self.file.read(16))
+            block_end = block_start + block.uncompressed_size
+            if block_end > start:
+                needed = min(end, block_end) - block_start
+                block_header, payload = self.read_block(file_info, block)
+                if block_header.dat_block_type == 32000:
+                    inflated = payload[:needed]
+                else:
+                    # stops inflating once the end of the range is reached
+                    inflated = zlib.decompressobj(-15).decompress(payload, needed)
+                data += inflated[max(start - block_start, 0) :]
+            block_start = block_end
+        return bytes(data)
+
+    def iter_standard_blocks(self, file_info):
+        # type: (SqPackFileInfo) -> Iterator[tuple[DatStdFileBlockInfos, DatBlockHeader, bytes]]
+        """The block info, block header and still compressed payload of every block."""
+        block_bytes = self.read_at(
+            file_info.offset + 24, file_info.number_of_blocks * 8
+        )
+        for i in range(file_info.number_of_blocks):
+            block = DatStdFileBlockInfos(block_bytes[i * 8 : i * 8 + 8])
+            yield (block, *self.read_block(file_info, block))
+
+    def read_block(self, file_info, block):
+        # type: (SqPackFileInfo, DatStdFileBlockInfos) -> tuple[DatBlockHeader, bytes]
+        block_offset = file_info.offset + file_info.header_size + block.offset
+        block_header = DatBlockHeader(self.read_at(block_offset, 16))
+        return block_header, self.read_at(
+            block_offset + 16, block_header.block_data_size
+        )
+
+    def read_standard_blocks(self, file_info):
+        # type: (SqPackFileInfo) -> list[tuple[DatStdFileBlockInfos, DatBlockHeader, bytes]]
+        return list(self.iter_standard_blocks(file_info))
+
+    def read_standard_file(
+        self, file_info, executor=None, parallel_threshold=PARALLEL_THRESHOLD
+    ):
+        # type: (SqPackFileInfo, Executor | None, int) -> list[bytes]
+        """
+        Read and inflate every block of a standard file.
+
+        Args:
+            file_info: The file to read.
+            executor: Optional pool to inflate the blocks on concurrently.
+            parallel_threshold: Files smaller than this many bytes are always
+                inflated serially.
+        """
+        blocks = self.read_standard_blocks(file_info)
+        if (
+            executor is None
+            or len(blocks) < 2
+            or file_info.raw_file_size < parallel_threshold
+        ):
+            return [decompress_block(header, payload) for _, header, payload in blocks]
+        # zlib.decompress releases the GIL, map hands the batches back in order
+        batches = [
+            [(header, payload) for _, header, payload in blocks[i : i + PARALLEL_BATCH]]
+            for i in range(0, len(blocks), PARALLEL_BATCH)
+        ]
+        return [
+            block
+            for batch in executor.map(decompress_blocks, batches)
+            for block in batch
+        ]
+
+    def readinto_standard_file(self, file_info, buffer):
+        # type: (SqPackFileInfo, bytearray | memoryview) -> int
+        view = memoryview(buffer).cast("B")
+        if len(view) < file_info.raw_file_size:
+            raise ValueError(
+                "Buffer of {0} bytes can't hold {1} bytes".format(
+                    len(view), file_info.raw_file_size
+                )
+            )
+        position = 0
+        for block, block_header, payload in self.iter_standard_blocks(file_info):
+            size = block.uncompressed_size
             if block_header.dat_block_type == 32000:
-                data.append(self.file.read(block_header.block_data_size))
+                data = payload[:size]
             else:
-                data.append(
-                    zlib.decompress(
-                        self.file.read(block_header.block_data_size), wbits=-15
-                    )
-                )
+                # bounded by the block's size, never more than one block in flight
+                data = zlib.decompressobj(-15).decompress(payload, size)
+            view[position : position + len(data)] = data
+            position += len(data)
+        return position
 
-        return data
+    def close(self):
+        # type: () -> None
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+            self.mmap.close()
+        self.file.close()
 
     def __repr__(self):
         # type: () -> str
         return "Path: {0} Header: {1}".format(
             os.path.join(self.root, "sqpack", self.path), self.header
         )
+
+
+class SqPackFileReader(io.RawIOBase):
+    """Read-only file object over one standard file, inflating a block at a time."""
+
+    def __init__(self, sqpack, offset, on_close=None):
+        # type: (SqPack, int, Callable[[], None] | None) -> None
+        super().__init__()
+        self.sqpack = sqpack
+        self.file_info = sqpack.get_file_info(offset)
+        self.blocks = sqpack.iter_file(offset)
+        self.block = memoryview(b"")
+        self.block_position = 0
+        self.position = 0
+        self.on_close = on_close
+
+    def readable(self):
+        # type: () -> bool
+        return True
+
+    def readinto(self, buffer):
+        # type: (bytearray | memoryview) -> int
+        view = memoryview(buffer).cast("B")
+        written = 0
+        while written < len(view):
+            if self.block_position == len(self.block):
+                block = next(self.blocks, None)
+                if block is None:
+                    break
+                self.block = memoryview(block)
+                self.block_position = 0
+            size = min(len(view) - written, len(self.block) - self.block_position)
+            view[written : written + size] = self.block[
+                self.block_position : self.block_position + size
+            ]
+            self.block_position += size
+            written += size
+        self.position += written
+        return written
+
+    def tell(self):
+        # type: () -> int
+        return self.position
+
+    def close(self):
+        # type: () -> None
+        if not self.closed:
+            self.blocks.close()
+            self.block = memoryview(b"")
+            if self.on_close is not None:
+                self.on_close()
+        super().close()
+
+    def __repr__(self):
+        # type: () -> str
+        return "SqPackFileReader: {0}@{1:X}, {2}/{3} bytes".format(
+            self.sqpack.path,
+            self.file_info.offset,
+            self.position,
+            self.file_info.raw_file_size,
+        )
@@ -0,0 +1,76 @@
+"""
+Builds EXH headers and EXD pages of small, synthetic excel sheets for the
+tests, see luminapie.excel_data for the layout.
+"""
+from luminapie.enums import ExcelColumnDataType
+from luminapie.excel_data import COLUMN_FORMATS, is_packed_bool
+import numpy as np
+import struct
+
+
+def sheet_header(columns, row_size, pages, languages, variant=1):
+    # type: (list[tuple[ExcelColumnDataType, int]], int, list[tuple[int, int]], list[int], int) -> bytes
+    """An EXH file: columns as (type, offset), pages as (start id, row count)."""
+    data = b"EXHF" + struct.pack(
+        ">HHHHHHBBHI",
+        3,
+        row_size,
+        len(columns),
+        len(pages),
+        len(languages),
+        0,
+        0,
+        variant,
+        0,
+        sum(count for _, count in pages),
+    )
+    data = data.ljust(32, b"\0")
+    data += b"".join(struct.pack(">HH", type, offset) for type, offset in columns)
+    data += b"".join(struct.pack(">II", start, count) for start, count in pages)
+    data += b"".join(struct.pack("<H", language) for language in languages)
+    return data
+
+
+def fixed_data(columns, row_size, values, strings):
+    # type: (list[tuple[ExcelColumnDataType, int]], int, list[object], bytearray) -> bytes
+    """The fixed size data of one (sub)row, its strings are appended to strings."""
+    data = bytearray(row_size)
+    for (type, offset), value in zip(columns, values):
+        if type == ExcelColumnDataType.String:
+            struct.pack_into(">I", data, offset, len(strings))
+            strings += value.encode("utf-8") if isinstance(value, str) else value
+            strings += b"\0"
+        elif is_packed_bool(type):
+            if value:
+                data[offset] |= 1 << (type - ExcelColumnDataType.PackedBool0)
+        else:
+            raw = np.array(value, COLUMN_FORMATS[type]).tobytes()
+            data[offset : offset + len(raw)] = raw
+    return bytes(data)
+
+
+def sheet_page(columns, row_size, rows, variant=1):
+    # type: (list[tuple[ExcelColumnDataType, int]], int, dict[int, list[list[object]]], int) -> bytes
+    """
+    An EXD page of rows by row id, each a list of subrows of column values.
+    Rows of variant 1 sheets have one subrow, subrow ids count from 0.
+    """
+    index_size = len(rows) * 8
+    index = b""
+    body = b""
+    for row_id, subrows in rows.items():
+        strings = bytearray()
+        if variant == 1:
+            data = fixed_data(columns, row_size, subrows[0], strings)
+        else:
+            data = b"".join(
+                struct.pack(">H", subrow_id)
+                + fixed_data(columns, row_size, values, strings)
+                for subrow_id, values in enumerate(subrows)
+            )
+        data += bytes(strings)
+        data = data.ljust((len(data) + 3) & ~3, b"\0")
+        index += struct.pack(">II", row_id, 0x20 + index_size + len(body))
+        body += struct.pack(">IH", len(data), len(subrows)) + data
+    header = b"EXDF" + struct.pack(">HHII", 2, 0, index_size, len(body))
+    return header.ljust(0x20, b"\0") + index + body
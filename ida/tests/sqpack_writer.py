@@ -0,0 +1,165 @@
+"""
+Writes small, synthetic game folders for the tests: one repository with an
+.index, an .index2 and a .dat0 per category, holding the given files. Paths
+sharing a hash are written to the synonym tables.
+"""
+from luminapie.enums import SqPackCatergories, SqPackFileType
+from luminapie.se_crc import Crc32
+import os
+import struct
+import zlib
+
+crc = Crc32()
+HEADER_SIZE = 1024
+ALIGNMENT = 128
+SYNONYM_ENTRY_SIZE = 0x100
+
+
+def align(size, alignment=ALIGNMENT):
+    # type: (int, int) -> int
+    return (size + alignment - 1) & ~(alignment - 1)
+
+
+def sqpack_header(type):
+    # type: (int) -> bytes
+    header = b"SqPack\0\0" + bytes([0, 0, 0, 0])
+    header += struct.pack("<III", HEADER_SIZE, 1, type)
+    return header.ljust(HEADER_SIZE, b"\0")
+
+
+def standard_file(data, block_size=16000, compress=True):
+    # type: (bytes, int, bool) -> bytes
+    """A standard file entry: its info, block table and the blocks."""
+    blocks = []
+    for start in range(0, max(len(data), 1), block_size):
+        raw = data[start : start + block_size]
+        if compress:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            payload = compressor.compress(raw) + compressor.flush()
+            block_type = len(raw)
+        else:
+            payload = raw
+            block_type = 32000
+        header = struct.pack("<IIII", 16, 0, len(payload), block_type)
+        blocks.append((len(payload), len(raw), header + payload))
+
+    header_size = align(24 + len(blocks) * 8)
+    info = struct.pack(
+        "<IIIIII", header_size, SqPackFileType.Standard, len(data), 0, 0, len(blocks)
+    )
+    table = b""
+    body = b""
+    for compressed_size, raw_size, block in blocks:
+        table += struct.pack("<IHH", len(body), compressed_size, raw_size)
+        body += block.ljust(align(len(block)), b"\0")
+    return (info + table).ljust(header_size, b"\0") + body
+
+
+def typed_file(type, size):
+    # type: (SqPackFileType, int) -> bytes
+    """The info of a file of another type, e.g. a model, without any contents."""
+    return struct.pack("<IIIIII", ALIGNMENT, type, size, 0, 0, 0).ljust(
+        ALIGNMENT, b"\0"
+    )
+
+
+def hash_tables(entries, entry_format):
+    # type: (dict[int, list[tuple[str, int]]], str) -> tuple[list[int], bytes, bytes]
+    """
+    The sorted hashes, hash table and synonym table of (path, data word)
+    entries by hash. A hash of several paths gets one entry flagged as a
+    synonym, the synonym table has the data word of each of its paths.
+    """
+    hashes = sorted(entries)
+    table = b""
+    synonyms = b""
+    for hash in hashes:
+        paths = entries[hash]
+        if len(paths) == 1:
+            table += struct.pack(entry_format, hash, paths[0][1])
+            continue
+        table += struct.pack(entry_format, hash, 0b1)
+        for path, data in paths:
+            position = len(synonyms) // SYNONYM_ENTRY_SIZE
+            synonyms += struct.pack("<QII", hash, data, position)
+            synonyms += path.encode("utf-8").ljust(SYNONYM_ENTRY_SIZE - 16, b"\0")
+    if synonyms:
+        # the table ends with an entry without a path
+        synonyms += bytes(SYNONYM_ENTRY_SIZE)
+    return hashes, table, synonyms
+
+
+def write_index(path, table, synonyms, dir_table=b""):
+    # type: (str, bytes, bytes, bytes) -> None
+    table_offset = HEADER_SIZE * 2
+    synonym_offset = table_offset + len(table)
+    dir_offset = synonym_offset + len(synonyms)
+    index_header = bytearray(HEADER_SIZE)
+    struct.pack_into(
+        "<IIII", index_header, 0, HEADER_SIZE, 1, table_offset, len(table)
+    )
+    struct.pack_into("<I", index_header, 80, 1)
+    struct.pack_into("<II", index_header, 84, synonym_offset, len(synonyms))
+    struct.pack_into("<II", index_header, 228, dir_offset, len(dir_table))
+    with open(path, "wb") as f:
+        f.write(sqpack_header(2))
+        f.write(index_header)
+        f.write(table)
+        f.write(synonyms)
+        f.write(dir_table)
+
+
+def write_category(folder, category, files, index2=True):
+    # type: (str, int, dict[str, bytes], bool) -> None
+    stem = os.path.join(folder, "{0:02x}0000.win32".format(category))
+    dat = bytearray(sqpack_header(2))
+    entries: dict[int, list[tuple[str, int]]] = {}
+    entries2: dict[int, list[tuple[str, int]]] = {}
+    for path, contents in files.items():
+        offset = len(dat)
+        dat += contents.ljust(align(len(contents)), b"\0")
+        # data file 0, the offset in units of 8 bytes with the low bits free
+        entries.setdefault(crc.calc_index(path), []).append((path, offset // 8))
+        entries2.setdefault(crc.calc_index2(path), []).append((path, offset // 8))
+    with open(stem + ".dat0", "wb") as f:
+        f.write(dat)
+
+    hashes, hash_table, synonyms = hash_tables(entries, "<QI4x")
+    folders: dict[int, list[int]] = {}
+    for position, hash in enumerate(hashes):
+        folders.setdefault(hash >> 32, []).append(position)
+    dir_table = b"".join(
+        struct.pack(
+            "<IIII",
+            folder_hash,
+            HEADER_SIZE * 2 + positions[0] * 16,
+            len(positions) * 16,
+            0,
+        )
+        for folder_hash, positions in sorted(folders.items())
+    )
+    write_index(stem + ".index", hash_table, synonyms, dir_table)
+    if index2:
+        _, hash_table2, synonyms2 = hash_tables(entries2, "<II")
+        write_index(stem + ".index2", hash_table2, synonyms2)
+
+
+def write_game(root, files, index2=True):
+    # type: (str, dict[str, bytes], bool) -> str
+    """
+    Write files, by path, as the ffxiv repository of a game folder in root.
+
+    Values are whole standard file entries, see standard_file and typed_file.
+    Without index2 only the .index files are written.
+    """
+    folder = os.path.join(root, "sqpack", "ffxiv")
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(root, "ffxivgame.ver"), "w") as f:
+        f.write("2024.01.01.0000.0000")
+    categories: dict[int, dict[str, bytes]] = {}
+    for path, contents in files.items():
+        category = SqPackCatergories[path.split("/")[0].upper()]
+        categories.setdefault(category, {})[path] = contents
+    for category, category_files in categories.items():
+        write_category(folder, category, category_files, index2)
+    return root
@@ -0,0 +1,26 @@
+from luminapie.async_game_data import AsyncGameData
+from luminapie.game_data import GameData
+from sqpack_writer import standard_file, write_game
+import asyncio
+
+
+def test_shared_across_event_loops(tmp_path):
+    files = {"exd/file_{0}.bin".format(i): bytes([i]) * 5000 for i in range(8)}
+    root = write_game(
+        str(tmp_path), {path: standard_file(data) for path, data in files.items()}
+    )
+    game_data = GameData(root, load_schema=False)
+    # created outside of any loop, then used by two of them with more reads
+    # than max_concurrency waiting on the semaphore
+    wrapper = AsyncGameData(game_data, max_concurrency=2)
+
+    async def read_all():
+        # type: () -> list[bytes]
+        blocks = await asyncio.gather(*(wrapper.get_file(path) for path in files))
+        return [b"".join(data) for data in blocks]
+
+    try:
+        for _ in range(2):
+            assert asyncio.run(read_all()) == list(files.values())
+    finally:
+        game_data.close()
@@ -0,0 +1,92 @@
+from luminapie.game_data import GameData, ParsedFileName
+from luminapie.sqpack import SqPack
+from concurrent.futures import ThreadPoolExecutor
+from sqpack_writer import standard_file, write_game
+import os
+import random
+import pytest
+
+THREADS = 16
+ROUNDS = 20
+
+
+def file_contents(i):
+    # type: (int) -> bytes
+    """Several blocks each, compressible but different per file and per block."""
+    random.seed(i)
+    size = 40000 + i * 7919
+    return bytes(random.getrandbits(3) + (i & 0xF0) for _ in range(size))
+
+
+@pytest.fixture(scope="module")
+def game(tmp_path_factory):
+    # type: (pytest.TempPathFactory) -> tuple[str, dict[str, bytes]]
+    files = {"exd/stress/file_{0}.bin".format(i): file_contents(i) for i in range(12)}
+    # an uncompressed one too, its blocks are copied instead of inflated
+    files["exd/stress/raw.bin"] = os.urandom(50000)
+    entries = {
+        path: standard_file(data, compress=path != "exd/stress/raw.bin")
+        for path, data in files.items()
+    }
+    root = write_game(str(tmp_path_factory.mktemp("game")), entries)
+    return root, files
+
+
+def read_everywhere(read, keys):
+    # type: (callable, list) -> list
+    shuffled = keys * ROUNDS
+    random.Random(1).shuffle(shuffled)
+    with ThreadPoolExecutor(THREADS) as executor:
+        return list(zip(shuffled, executor.map(read, shuffled)))
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_read_at_from_many_threads(game, use_mmap):
+    root, _ = game
+    path = os.path.join(root, "sqpack", "ffxiv", "0a0000.win32.dat0")
+    with open(path, "rb") as f:
+        expected = f.read()
+    sqpack = SqPack(root, path, use_mmap)
+    try:
+        random.seed(2)
+        ranges = [
+            (random.randrange(len(expected)), random.randrange(1, 20000))
+            for _ in range(200)
+        ]
+        results = read_everywhere(lambda key: bytes(sqpack.read_at(*key)), ranges)
+    finally:
+        sqpack.close()
+    for (offset, size), data in results:
+        assert data == expected[offset : offset + size]
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+@pytest.mark.parametrize("decompress_workers", [0, 4])
+def test_game_data_from_many_threads(game, use_mmap, decompress_workers):
+    root, files = game
+    paths = list(files)
+    with GameData(
+        root,
+        load_schema=False,
+        use_mmap=use_mmap,
+        # fewer handles than dat files read at once forces pool evictions
+        max_open_files=1,
+        decompress_workers=decompress_workers,
+        parallel_threshold=0,
+    ) as game_data:
+        serial = {
+            path: b"".join(game_data.get_file(ParsedFileName(path))) for path in paths
+        }
+        assert serial == files
+
+        results = read_everywhere(
+            lambda path: b"".join(game_data.get_file(ParsedFileName(path))), paths
+        )
+        ranges = read_everywhere(
+            lambda path: game_data.read_range(ParsedFileName(path), 15000, 20000),
+            paths,
+        )
+    for path, data in results:
+        assert data == serial[path]
+    for path, data in ranges:
+        assert data == serial[path][15000:35000]
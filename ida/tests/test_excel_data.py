@@ -0,0 +1,103 @@
+from typing import Iterator
+import gc
+import pathlib
+import pytest
+import weakref
+
+# the excel extra
+np = pytest.importorskip("numpy")
+
+from luminapie.enums import ExcelColumnDataType, Language
+from luminapie.excel_data import ExcelSheet
+from luminapie.game_data import GameData
+from exd_writer import sheet_header, sheet_page
+from sqpack_writer import standard_file, write_game
+
+COLUMNS = [(ExcelColumnDataType.String, 0), (ExcelColumnDataType.UInt16, 4)]
+ROW_SIZE = 8
+
+
+@pytest.fixture
+def subrow_game(tmp_path):
+    # type: (pathlib.Path) -> Iterator[GameData]
+    pages = [
+        {0: [["a", 1], ["b", 2]], 1: [["c", 3]]},
+        {5: [["d", 4], ["e", 5], ["f", 6]]},
+    ]
+    files = {
+        "exd/quest.exh": sheet_header(
+            COLUMNS, ROW_SIZE, [(0, 2), (5, 1)], [Language.English], variant=2
+        ),
+        "exd/quest_0_en.exd": sheet_page(COLUMNS, ROW_SIZE, pages[0], variant=2),
+        "exd/quest_5_en.exd": sheet_page(COLUMNS, ROW_SIZE, pages[1], variant=2),
+    }
+    root = write_game(
+        str(tmp_path), {path: standard_file(data) for path, data in files.items()}
+    )
+    with GameData(root, load_schema=False) as game_data:
+        yield game_data
+
+
+def test_subrow_sheet_counts(subrow_game):
+    sheet = ExcelSheet(subrow_game, "quest")
+    assert sheet.row_count == 3
+    subrows = list(sheet)
+    assert [(row.row_id, row.subrow_id) for row in subrows] == [
+        (0, 0),
+        (0, 1),
+        (1, 0),
+        (5, 0),
+        (5, 1),
+        (5, 2),
+    ]
+    assert [row[1] for row in subrows] == [1, 2, 3, 4, 5, 6]
+    assert [row.subrow_id for row in sheet[5]] == [0, 1, 2]
+    assert sheet[0, 1][0].text == "b"
+
+
+def test_strings_compare_by_bytes_and_drop_their_page(subrow_game):
+    sheet = ExcelSheet(subrow_game, "quest", page_cache_size=1)
+    string = sheet[0, 1][0]
+    assert string == b"b"
+    assert string == sheet.get((0, 1)).get(0)
+    assert string != "b" and string.text == "b"
+    assert {b"b": 1}[string] == 1
+    assert len({string, sheet[0, 1][0], sheet[1, 0][0]}) == 2
+
+    page = weakref.ref(sheet.get_page(0))
+    sheet.get_page(1)
+    gc.collect()
+    assert page() is None
+    assert string.text == "b"
+
+
+def test_load_sheet_shares_untranslated_columns(tmp_path):
+    columns = COLUMNS + [(ExcelColumnDataType.Int16, 6)]
+    languages = [Language.English, Language.German]
+    names = {Language.English: ["one", "two"], Language.German: ["eins", "zwei"]}
+    files = {
+        "exd/item.exh": sheet_header(columns, ROW_SIZE, [(0, 2)], languages),
+    }
+    for language, suffix in ((Language.English, "en"), (Language.German, "de")):
+        rows = {
+            row_id: [[names[language][row_id], 100 + row_id, language * 10 + row_id]]
+            for row_id in range(2)
+        }
+        files["exd/item_0_{0}.exd".format(suffix)] = sheet_page(columns, ROW_SIZE, rows)
+    root = write_game(
+        str(tmp_path), {path: standard_file(data) for path, data in files.items()}
+    )
+    with GameData(root, load_schema=False) as game_data:
+        sheets = game_data.load_sheet("item", workers=2)
+    english = sheets[Language.English].get_page(0)
+    german = sheets[Language.German].get_page(0)
+
+    assert german.shared == {"column_1"}
+    assert np.shares_memory(german.column(1), english.column(1))
+    assert not np.shares_memory(german.column(2), english.column(2))
+    assert not np.shares_memory(german.fields["column_0"], english.fields["column_0"])
+    assert german.column(1).tolist() == [100, 101]
+    assert german.column(2).tolist() == [30, 31]
+    assert english.column(2).tolist() == [20, 21]
+    assert [s.text for s in german.strings(0)] == ["eins", "zwei"]
+    assert [s.text for s in english.strings(0)] == ["one", "two"]
@@ -0,0 +1,118 @@
+from luminapie import extract
+from luminapie.enums import SqPackFileType
+from luminapie.path_dictionary import PathDictionary
+from sqpack_writer import standard_file, typed_file, write_game
+import argparse
+import os
+import pytest
+
+
+def parse_args(*argv):
+    # type: (str) -> argparse.Namespace
+    parser = argparse.ArgumentParser()
+    extract.add_arguments(parser)
+    return parser.parse_args(list(argv))
+
+
+def test_unreadable_types_are_skipped_for_good(tmp_path, capsys):
+    root = write_game(
+        str(tmp_path / "game"),
+        {
+            "ui/uld/one.uld": standard_file(b"uld " * 10000),
+            "ui/icon/000000/000001.tex": typed_file(SqPackFileType.Texture, 4096),
+            "chara/equipment/e0001/model/c0101e0001_top.mdl": typed_file(
+                SqPackFileType.Model, 4096
+            ),
+        },
+    )
+    output = str(tmp_path / "out")
+    args = parse_args(
+        root,
+        output,
+        "--workers",
+        "1",
+        "--hash-range",
+        "ffxiv:ui",
+        "--hash-range",
+        "ffxiv:chara",
+    )
+
+    assert extract.run(args) == 0
+    done, skipped = extract.read_journal(os.path.join(output, extract.JOURNAL_NAME))
+    assert len(done) == 1
+    assert sorted(skipped.values()) == ["Model", "Texture"]
+    assert "Skipped 1 Texture files" in capsys.readouterr().out
+
+    # nothing is left, the skipped files aren't tried again
+    assert extract.run(args) == 0
+    assert "1 already extracted, 2 skipped, 0 not found, 0 to go" in (
+        capsys.readouterr().out
+    )
+
+
+@pytest.mark.parametrize("output", ["../escape.uld", "ui/../../escape.uld", "/tmp/x"])
+def test_output_paths_stay_in_the_output(tmp_path, output):
+    with pytest.raises(ValueError):
+        extract.get_output_file(str(tmp_path), output)
+
+
+def test_dictionary_paths_are_checked_too(tmp_path, capsys):
+    # the dictionary names the file, so it is its hash that matches
+    escaping = "ui/../../escape.uld"
+    root = write_game(
+        str(tmp_path / "game"),
+        {
+            escaping: standard_file(b"escape"),
+            "ui/uld/two.uld": standard_file(b"two"),
+        },
+    )
+    dictionary = str(tmp_path / "paths.lppd")
+    PathDictionary.build([escaping, "ui/uld/two.uld"], dictionary)
+    output = str(tmp_path / "out" / "files")
+    args = parse_args(
+        root,
+        output,
+        "--workers",
+        "1",
+        "--hash-range",
+        "ffxiv:ui",
+        "--dictionary",
+        dictionary,
+    )
+
+    assert extract.run(args) == 1
+    assert "Failed: " + escaping in capsys.readouterr().out
+    assert not os.path.exists(tmp_path / "escape.uld")
+    done, _ = extract.read_journal(os.path.join(output, extract.JOURNAL_NAME))
+    assert done == {"ui/uld/two.uld"}
+
+
+def test_write_errors_fail_only_their_file(tmp_path, capsys):
+    root = write_game(
+        str(tmp_path / "game"),
+        {
+            "ui/uld/one.uld": standard_file(b"one"),
+            "exd/root.exl": standard_file(b"EXLT"),
+        },
+    )
+    output = tmp_path / "out"
+    output.mkdir()
+    # a file where ui/uld/one.uld needs a folder
+    (output / "ui").write_bytes(b"")
+    args = parse_args(
+        root,
+        str(output),
+        "--workers",
+        "1",
+        "--path",
+        "ui/uld/one.uld",
+        "--path",
+        "exd/root.exl",
+    )
+
+    assert extract.run(args) == 1
+    assert "Failed: ui/uld/one.uld" in capsys.readouterr().out
+    assert (output / "exd" / "root.exl").read_bytes() == b"EXLT"
+    done, _ = extract.read_journal(str(output / extract.JOURNAL_NAME))
+    assert done == {"exd/root.exl"}
+    assert [name for name in os.listdir(output) if name.endswith(".part")] == []
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+from luminapie.game_data import GameData, ParsedFileName
+from sqpack_writer import standard_file, write_game
+import os
+import pytest
+
+
+def test_failed_setup_shuts_the_executor_down(tmp_path, monkeypatch):
+    root = write_game(str(tmp_path), {"exd/root.exl": standard_file(b"EXLT")})
+    with open(os.path.join(root, "ffxivgame.ver"), "w") as f:
+        f.write("not a version")
+    shutdown: list[ThreadPoolExecutor] = []
+    original = ThreadPoolExecutor.shutdown
+    monkeypatch.setattr(
+        ThreadPoolExecutor,
+        "shutdown",
+        lambda self, *args, **kwargs: (
+            shutdown.append(self),
+            original(self, *args, **kwargs),
+        ),
+    )
+    with pytest.raises(ValueError):
+        GameData(root, load_schema=False, decompress_workers=2)
+    assert len(shutdown) == 1
+
+
+def test_readinto_matches_get_file(tmp_path):
+    files = {
+        "exd/blocks.bin": bytes(range(256)) * 300,
+        "exd/stored.bin": os.urandom(40000),
+    }
+    entries = {
+        path: standard_file(data, compress=path != "exd/stored.bin")
+        for path, data in files.items()
+    }
+    root = write_game(str(tmp_path), entries)
+    with GameData(root, load_schema=False) as game_data:
+        for path, data in files.items():
+            file = ParsedFileName(path)
+            assert b"".join(game_data.get_file(file)) == data
+            assert game_data.read_file_into(file) == data
+            buffer = bytearray(len(data) + 10)
+            assert game_data.readinto(file, buffer) == len(data)
+            assert buffer[: len(data)] == data
+            with pytest.raises(ValueError):
+                game_data.readinto(file, bytearray(len(data) - 1))
+
+
+# same length names with the same CRC, so their full paths collide as well
+COLLIDING = ["exd/collide/4f4630102e51.bin", "exd/collide/58a6f5008b51.bin"]
+
+
+@pytest.mark.parametrize("index2", [True, False])
+def test_colliding_paths_resolve_through_synonyms(tmp_path, index2):
+    files = {
+        COLLIDING[0]: b"first" * 1000,
+        COLLIDING[1]: b"second" * 1000,
+        "exd/root.exl": b"EXLT",
+    }
+    root = write_game(
+        str(tmp_path),
+        {path: standard_file(data) for path, data in files.items()},
+        index2,
+    )
+    parsed = [ParsedFileName(path) for path in COLLIDING]
+    assert parsed[0].index == parsed[1].index
+    assert parsed[0].index2 == parsed[1].index2
+
+    with GameData(root, load_schema=False) as game_data:
+        for path, data in files.items():
+            assert b"".join(game_data.get_file(ParsedFileName(path))) == data
+        repo = game_data.repositories[0]
+        category = repo.get_category(0x0A)
+        # full path lookups only load the index they go through
+        assert (category.index2 is not None) == index2
+        assert (category.index is not None) != index2
+        # a bare index1 hash can't tell the colliding paths apart
+        with pytest.raises(KeyError):
+            repo.find_entry(parsed[0].index, 0x0A)
+        assert len(category.load().synonyms[parsed[0].index]) == 2
+
+
+def test_from_many_matches_parsing_each_path():
+    paths = [
+        "exd/root.exl",
+        "BG/ex2/01_xxx/twn/bgparts/file.mdl ",
+        "music/ex1/bgm_ex1_title.scd",
+        "bg/ex/level.lvb",
+        "exd//root.exl",
+    ]
+    for file, path in zip(ParsedFileName.from_many(paths), paths):
+        expected = ParsedFileName(path)
+        for name in ("path", "category", "category_id", "repo", "index", "index2"):
+            assert getattr(file, name) == getattr(expected, name), (path, name)
+    with pytest.raises(IndexError):
+        ParsedFileName.from_many(["root.exl"])
@@ -0,0 +1,61 @@
+from luminapie.index import SqPackIndex
+import random
+import struct
+
+TABLE_OFFSET = 2048
+
+
+def index_tables(pack_id, hashes):
+    # type: (int, list[int]) -> tuple[int, bytes, bytes, bytes, int]
+    """The tables of one index file holding hashes, with its dir segment."""
+    hashes = sorted(hashes)
+    table = b"".join(
+        struct.pack("<QII", hash, pos << 4, 0) for pos, hash in enumerate(hashes)
+    )
+    folders: dict[int, list[int]] = {}
+    for pos, hash in enumerate(hashes):
+        folders.setdefault(hash >> 32, []).append(pos)
+    dir_table = b"".join(
+        struct.pack(
+            "<IIII", folder, TABLE_OFFSET + positions[0] * 16, len(positions) * 16, 0
+        )
+        for folder, positions in sorted(folders.items())
+    )
+    return pack_id, table, b"", dir_table, TABLE_OFFSET
+
+
+def random_hashes(seed, folders, count):
+    # type: (int, list[int], int) -> list[int]
+    random.seed(seed)
+    return [random.choice(folders) << 32 | random.getrandbits(32) for _ in range(count)]
+
+
+def test_folder_runs_from_dir_segments():
+    folders = [random.getrandbits(32) for _ in range(40)]
+    tables = [
+        index_tables(0, random_hashes(1, folders[:30], 500)),
+        index_tables(1, random_hashes(2, folders[10:], 500)),
+    ]
+    index = SqPackIndex.from_tables(tables)
+    assert len(index.folders) == len(set(folders))
+    for folder in folders:
+        run = index.find_folder(folder)
+        assert run == index.find_range(folder << 32, folder << 32 | 0xFFFFFFFF)
+        assert len(run) > 0
+
+
+def test_folders_missing_from_dir_segments():
+    folders = [random.getrandbits(32) for _ in range(20)]
+    pack_id, table, synonyms, dir_table, offset = index_tables(
+        0, random_hashes(3, folders, 300)
+    )
+    # a truncated segment, and a second index file without one
+    tables = [
+        (pack_id, table, synonyms, dir_table[: len(dir_table) // 2], offset),
+        index_tables(1, random_hashes(4, folders, 300))[:3] + (b"", TABLE_OFFSET),
+    ]
+    index = SqPackIndex.from_tables(tables)
+    for folder in folders:
+        run = index.find_folder(folder)
+        assert run == index.find_range(folder << 32, folder << 32 | 0xFFFFFFFF)
+        assert len(run) > 0
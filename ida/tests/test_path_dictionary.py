@@ -0,0 +1,95 @@
+from luminapie.enums import ExcelColumnDataType, Language
+from luminapie.game_data import GameData
+from luminapie.path_dictionary import PathDictionary, get_excel_paths
+from luminapie.se_crc import Crc32
+from sqpack_writer import standard_file, write_game
+import pytest
+
+crc = Crc32()
+# same length names with the same CRC, their index1 and index2 hashes collide
+COLLIDING = ["exd/collide/4f4630102e51.bin", "exd/collide/58a6f5008b51.bin"]
+PATHS = [
+    "exd/root.exl",
+    "EXD/Item.exh",
+    "exd/item_0_en.exd",
+    "exd/item_0_en.exd",
+    "ui/uld/title.uld",
+    "ui/uld/ä漢字.uld",
+    "chara/equipment/e0001/model/c0101e0001_top.mdl",
+    "",
+] + COLLIDING
+
+
+@pytest.fixture
+def dictionary(tmp_path):
+    path = str(tmp_path / "paths.lppd")
+    # a small block size so the paths span several string blocks
+    assert PathDictionary.build(PATHS, path, block_size=3) == 8
+    with PathDictionary(path) as dictionary:
+        yield dictionary
+
+
+def test_round_trip(dictionary):
+    expected = {path.lower() for path in PATHS} - {""}
+    assert len(dictionary) == len(expected)
+    assert sorted(dictionary.paths()) == sorted(expected)
+    for path in expected:
+        index, index2 = crc.calc_indexes(path)
+        assert index in dictionary
+        assert path in dictionary.get_paths(index)
+        assert path in dictionary.get_paths2(index2)
+        if path not in COLLIDING:
+            assert dictionary.get(index) == path
+            assert dictionary.get_paths2(index2) == [path]
+
+
+def test_colliding_paths_are_all_kept(dictionary):
+    index, index2 = crc.calc_indexes(COLLIDING[0])
+    assert sorted(dictionary.get_paths(index)) == COLLIDING
+    assert sorted(dictionary.get_paths2(index2)) == COLLIDING
+    assert dictionary.get(index) in COLLIDING
+
+
+def test_unknown_hashes(dictionary):
+    index, index2 = crc.calc_indexes("exd/missing.exh")
+    assert dictionary.get(index) is None
+    assert dictionary.get(index, "default") == "default"
+    assert index not in dictionary
+    assert dictionary.get_paths(index) == []
+    assert dictionary.get_paths2(index2) == []
+    assert dictionary.get(0) is None
+    assert dictionary.get((1 << 64) - 1) is None
+
+
+def test_excel_paths_skip_unreadable_sheets(tmp_path):
+    # the excel extra, for the test sheet writer
+    pytest.importorskip("numpy")
+    from exd_writer import sheet_header
+
+    root_list = b"EXLT,2\r\nitem,0\r\nbroken,1\r\nmissing,2\r\nhidden,-1\r\n"
+    columns = [(ExcelColumnDataType.UInt32, 0)]
+    files = {
+        "exd/root.exl": root_list,
+        "exd/item.exh": sheet_header(
+            columns, 4, [(0, 10), (10, 5)], [Language.English, Language.German]
+        ),
+        "exd/broken.exh": b"EXHX" + bytes(60),
+    }
+    root = write_game(
+        str(tmp_path), {path: standard_file(data) for path, data in files.items()}
+    )
+    with GameData(root, load_schema=False) as game_data:
+        paths, skipped = get_excel_paths(game_data)
+    assert paths == [
+        "exd/root.exl",
+        "exd/item.exh",
+        "exd/item_0_en.exd",
+        "exd/item_0_de.exd",
+        "exd/item_10_en.exd",
+        "exd/item_10_de.exd",
+        "exd/broken.exh",
+        "exd/missing.exh",
+    ]
+    assert [name for name, _ in skipped] == ["broken", "missing"]
+    assert skipped[0][1].startswith("ValueError")
+    assert skipped[1][1].startswith("KeyError")
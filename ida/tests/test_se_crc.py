@@ -0,0 +1,65 @@
+from luminapie.se_crc import Crc32, PyCrc32
+import zlib
+
+# PyCrc32 splits off the folder with rstrip, which only agrees with the
+# folder of a path without repeated or trailing slashes in its folder part
+PATHS = [
+    "exd/root.exl",
+    "chara/equipment/e0001/model/c0101e0001_top.mdl",
+    "ui/uld/botanistgame.uld",
+    "exd/aa/a",
+    "ui/uld/ä漢字.uld",
+    "bgcommon/hou/indoor/général/0001/bgparts/fun_b0_m0001.mdl",
+    "root.exl",
+    "exd/",
+    "",
+]
+
+
+def test_matches_the_reference():
+    crc = Crc32()
+    reference = PyCrc32()
+    for path in PATHS:
+        index = reference.calc_index(path)
+        index2 = reference.calc_index2(path)
+        assert crc.calc_index(path) == index, path
+        assert crc.calc_index2(path) == index2, path
+        assert crc.calc_indexes(path) == (index, index2), path
+    assert crc.calc_index_many(PATHS) == [reference.calc_index(p) for p in PATHS]
+    assert crc.calc_index2_many(PATHS) == [reference.calc_index2(p) for p in PATHS]
+    assert crc.calc_indexes_many(PATHS) == [
+        (reference.calc_index(p), reference.calc_index2(p)) for p in PATHS
+    ]
+    values = [path.encode("utf-8") for path in PATHS] + [bytes(range(256)) * 3]
+    assert crc.calc_many(values) == [reference.calc(value) for value in values]
+
+
+def test_repeated_slashes_keep_their_folder():
+    crc = Crc32()
+    reference = PyCrc32()
+    for path, folder, name in (
+        ("exd//root.exl", "exd/", "root.exl"),
+        ("ui//uld///title.uld", "ui//uld//", "title.uld"),
+        ("/root.exl", "", "root.exl"),
+    ):
+        index = reference.calc(folder.encode("utf-8")) << 32 | reference.calc(
+            name.encode("utf-8")
+        )
+        assert crc.calc_index(path) == index, path
+        assert crc.calc_indexes(path) == (index, reference.calc_index2(path)), path
+        assert crc.calc_indexes_many([path]) == [crc.calc_indexes(path)], path
+
+
+def test_full_path_crc_continues_from_the_folder():
+    crc = Crc32()
+    for folder, name in (
+        (b"exd", b"root.exl"),
+        (b"chara/equipment/e0001/model", "c0101e0001_tóp.mdl".encode("utf-8")),
+        (b"", b"root.exl"),
+        (b"ui/uld", b""),
+    ):
+        path = folder + b"/" + name
+        assert zlib.crc32(b"/" + name, zlib.crc32(folder)) == zlib.crc32(path)
+        # the second time round the folder's CRC comes from the memo
+        for _ in range(2):
+            assert crc.calc_indexes(path.decode("utf-8"))[1] == crc.calc(path)
@@ -0,0 +1,37 @@
+from luminapie.enums import MacroCode
+from luminapie.sestring import SeString, get_text
+
+
+def macro(code, payload=b""):
+    # type: (int, bytes) -> bytes
+    return bytes([0x02, code, len(payload) + 1]) + payload + b"\x03"
+
+
+def test_get_text_skips_macros():
+    data = (
+        b"Hello" + macro(MacroCode.NewLine) + b"wor" + macro(0x13, b"\xe9\x02") + b"ld"
+    )
+    assert get_text(data) == "Hello\nworld"
+    string = SeString(data)
+    assert [payload.name for payload in string.macros] == ["NewLine", "Color"]
+    assert string.to_macro_string() == "Hello<NewLine>wor<Color(gnum1)>ld"
+
+
+def test_invalid_macros_are_kept_as_text():
+    for broken in (b"\x02", b"\x02\x13", b"\x02\x13\x05ab", b"\x02\x13\xd5\x03"):
+        data = b"ok" + macro(MacroCode.Hyphen) + b"end" + broken
+        assert get_text(data) == "ok-end" + broken.decode("utf-8", "surrogateescape")
+        payloads = SeString(data).payloads
+        assert [payload.data for payload in payloads[-2:]] == [b"end", broken]
+
+
+def test_invalid_payloads_are_kept_raw():
+    # a valid frame around a comparison that's missing its right operand
+    data = b"a\x02\x08\x03\xe4\x02\x03b"
+    assert get_text(data) == "ab"
+    string = SeString(data)
+    assert string.text == "ab"
+    assert [payload.data for payload in string.payloads] == [b"a", b"\xe4\x02", b"b"]
+    assert not string.macros[0].parsed
+    assert string.macros[0].expressions == []
+    assert string.to_macro_string() == "a<If:e402>b"